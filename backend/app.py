@@ -1,12 +1,8 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import joblib
-import numpy as np
+import math
 import os
 import sys
-import json
-import ee
-import pandas as pd
 
 # -------------------------------
 # Setup
@@ -19,40 +15,107 @@ CORS(app, origins=["https://your-vercel-frontend.vercel.app"])
 # Add backend folder to path if needed
 sys.path.append(os.path.dirname(__file__))
 
+from ee_client import UNAVAILABLE, CircuitBreaker, CircuitOpen, UpstreamError
+from ee_processor import (
+    FEATURE_BACKEND, ee_client, ee_initialized, ee_pool, feature_cache, get_band_stats,
+    get_satellite_data_batch, nearby_cached_stats, point_box
+)
+from inference import feature_matrix
+from metrics import (
+    degraded_responses, finish_request, registry, request_seconds, requests_in_flight,
+    server_timing, snapshot, stage, start_request
+)
+from model_store import ModelStore, ModelsNotReady
+from pixel_map import MAP_DEFAULT_SCALE, encode_raster, parse_geometry, predict_map
+from profiler import PROFILING_ENABLED, SamplingProfiler
+from serving import Overloaded, RETRY_AFTER_S
+from timeseries import predict_timeseries
+
 # -------------------------------
-# Earth Engine Initialization
+# Models & Precomputed Village Grid
 # -------------------------------
-PROJECT_ID = os.environ.get("EE_PROJECT_ID", "your-default-project-id")
-
-def init_ee():
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+GRID_DIR = os.environ.get("VILLAGE_GRID_DIR", os.path.join(BASE_DIR, "grid"))
+GRID_MAX_KM = float(os.environ.get("GRID_MAX_KM", 2.0))
+# How far a degraded answer may reach for a grid cell when EE is unavailable
+DEGRADED_MAX_KM = float(os.environ.get("DEGRADED_MAX_KM", 25.0))
+
+# N, P and K are evaluated together by one compiled, memory-mapped engine.
+# MODEL_LOAD=eager loads it at import (in the gunicorn master when
+# preload_app is on); MODEL_LOAD=lazy defers it to the first request or
+# /ready probe.
+model_store = ModelStore(MODEL_DIR, GRID_DIR)
+
+if os.environ.get("MODEL_LOAD", "eager") == "eager":
     try:
-        if ee.data._initialized:
-            return
-
-        service_account = os.environ["EE_SERVICE_ACCOUNT"]
-        key_json = json.loads(os.environ["EE_PRIVATE_KEY"])
-
-        credentials = ee.ServiceAccountCredentials(
-            service_account, key_data=key_json
-        )
-
-        ee.Initialize(credentials, project=PROJECT_ID)
-        print(f"✅ Earth Engine initialized: {PROJECT_ID}")
-
-    except Exception as e:
-        print("❌ Earth Engine init failed:", e)
-        raise
+        model_store.load()
+    except Exception:
+        pass  # reported by /ready; retried by the next request or probe
 
 # -------------------------------
-# Load Models Globally
+# Instrumentation
 # -------------------------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-n_model = joblib.load(os.path.join(BASE_DIR, "models", "soil_nitrogen_model.joblib"))
-p_model = joblib.load(os.path.join(BASE_DIR, "models", "soil_phosphorus_model.joblib"))
-k_model = joblib.load(os.path.join(BASE_DIR, "models", "soil_potassium_model.joblib"))
-
-print("✅ Models loaded successfully.")
+@app.before_request
+def begin_request():
+    requests_in_flight.inc()
+    start_request()
+    if PROFILING_ENABLED and request.headers.get("X-Profile") == "1":
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def add_server_timing(response):
+    total, timings = finish_request()
+    if total is not None:
+        response.headers["Server-Timing"] = server_timing(total, timings)
+        request_seconds.observe(total, request.endpoint or "unknown", response.status_code)
+    return response
+
+@app.after_request
+def mark_simulated(response):
+    # Load-test data must never pass for a real prediction
+    if FEATURE_BACKEND == "simulated":
+        response.headers["X-Feature-Backend"] = "simulated"
+    return response
+
+@app.teardown_request
+def end_request(exc):
+    requests_in_flight.dec()
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop().report(request.endpoint or "unknown")
+
+def collect_runtime_metrics():
+    cache = feature_cache.stats()
+    pool = ee_pool.stats()
+    client = ee_client.stats()
+    return [
+        snapshot("soil_feature_cache_total", "Feature cache lookups by outcome", "counter",
+                 {k: cache[k] for k in ("hits", "disk_hits", "misses", "coalesced", "errors", "evictions")},
+                 label="outcome"),
+        snapshot("soil_feature_cache_entries", "Entries in the in-process feature cache", "gauge",
+                 cache["entries"]),
+        snapshot("soil_ee_pool_total", "Earth Engine executor submissions by outcome", "counter",
+                 {k: pool[k] for k in ("submitted", "rejected")}, label="outcome"),
+        snapshot("soil_ee_pool_in_flight", "Earth Engine calls running or queued", "gauge",
+                 pool["in_flight"]),
+        snapshot("soil_ee_calls_total", "Earth Engine client calls by outcome", "counter",
+                 {k: client[k] for k in ("calls", "short_circuited", "timed_out", "failed")},
+                 label="outcome"),
+        snapshot("soil_ee_breaker_state", "1 for the current Earth Engine circuit breaker state", "gauge",
+                 {s: int(s == client["breaker_state"]) for s in CircuitBreaker.STATES},
+                 label="state"),
+        snapshot("soil_ee_breaker_trips_total", "Times the Earth Engine circuit breaker opened", "counter",
+                 client["breaker_trips"]),
+        snapshot("soil_models_ready", "1 once the N/P/K engine is loaded", "gauge",
+                 int(model_store.state == "ready")),
+    ]
+
+registry.add_collector(collect_runtime_metrics)
+
+def json_response(payload):
+    with stage("serialize"):
+        return jsonify(payload)
 
 # -------------------------------
 # Fertilizer Suggestion Function
@@ -82,64 +145,29 @@ def get_fertilizer_suggestion(N, P, K):
     return suggestion
 
 # -------------------------------
-# Satellite Data Function
+# Batch Request Parsing
 # -------------------------------
-def mask_clouds(img):
-    qa = img.select("QA60")
-    cloud = qa.bitwiseAnd(1 << 10).eq(0)
-    cirrus = qa.bitwiseAnd(1 << 11).eq(0)
-    return img.updateMask(cloud.And(cirrus))
-
-def add_indices(image):
-    ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-    ndmi = image.normalizedDifference(['B8', 'B11']).rename('NDMI')
-    savi = image.expression(
-        '((NIR - RED) * (1 + L)) / (NIR + RED + L)',
-        {'NIR': image.select('B8'), 'RED': image.select('B4'), 'L': 0.5}
-    ).rename('SAVI')
-    bsi = image.expression(
-        '((SWIR1 + RED) - (NIR + BLUE)) / ((SWIR1 + RED) + (NIR + BLUE))',
-        {'SWIR1': image.select('B11'), 'RED': image.select('B4'),
-         'NIR': image.select('B8'), 'BLUE': image.select('B2')}
-    ).rename('BSI')
-    return image.addBands([ndvi, ndmi, savi, bsi])
-
-def get_satellite_data(lon, lat, box_size=0.1):
-    """Return Sentinel-2 stats as pandas DataFrame"""
-    init_ee()
-
-    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
-        raise ValueError("Invalid latitude / longitude")
-
-    geom = ee.Geometry.Rectangle([
-        lon - box_size / 2, lat - box_size / 2,
-        lon + box_size / 2, lat + box_size / 2
-    ])
-
-    col = (
-        ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-        .filterBounds(geom)
-        .filterDate("2023-03-01", "2023-05-30")
-        .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", 15))
-        .map(mask_clouds)
-        .map(add_indices)
-    )
-
-    img = col.median()
-    bands = ['B2', 'B3', 'B4', 'B8', 'B11', 'B12', 'NDVI', 'NDMI', 'SAVI', 'BSI']
-
-    stats = img.select(bands).reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=geom,
-        scale=200,
-        maxPixels=1e8
-    ).getInfo()
-
-    df = pd.DataFrame([stats])
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
-    df.fillna(0, inplace=True)
-
-    return df
+MAX_BATCH_POINTS = int(os.environ.get("MAX_BATCH_POINTS", 500))
+MAX_BOX_SIZE = 1.0
+
+def parse_box(item):
+    """Turn a batch entry ({lat, lon[, box_size]} or {bbox}) into box bounds"""
+    if not isinstance(item, dict):
+        raise ValueError("expected an object")
+    if "bbox" in item:
+        west, south, east, north = [float(v) for v in item["bbox"]]
+        if not (west < east and south < north):
+            raise ValueError("Invalid bbox, expected [west, south, east, north]")
+        if not (-90 <= south and north <= 90 and -180 <= west and east <= 180):
+            raise ValueError("Invalid latitude / longitude")
+        if east - west > MAX_BOX_SIZE or north - south > MAX_BOX_SIZE:
+            raise ValueError(f"bbox sides must be at most {MAX_BOX_SIZE} degrees")
+        return [west, south, east, north]
+
+    box_size = float(item.get("box_size", 0.1))
+    if not 0 < box_size <= MAX_BOX_SIZE:
+        raise ValueError(f"box_size must be in (0, {MAX_BOX_SIZE}]")
+    return point_box(float(item["lon"]), float(item["lat"]), box_size)
 
 # -------------------------------
 # API Routes
@@ -148,6 +176,107 @@ def get_satellite_data(lon, lat, box_size=0.1):
 def home():
     return "✅ MINO Soil Nutrient API is running"
 
+def prediction_payload(N, P, K):
+    N, P, K = float(N), float(P), float(K)
+    return {
+        "Nitrogen_avg": N,
+        "Phosphorus_avg": P,
+        "Potassium_avg": K,
+        "Suggestions": get_fertilizer_suggestion(N, P, K)
+    }
+
+def error_response(e):
+    """Map an exception from the prediction path to a JSON error response"""
+    if isinstance(e, (Overloaded, CircuitOpen, ModelsNotReady)):
+        return jsonify({"error": str(e)}), 503, {"Retry-After": str(RETRY_AFTER_S)}
+    if isinstance(e, TimeoutError):
+        return jsonify({"error": str(e)}), 504
+    if isinstance(e, UpstreamError):
+        return jsonify({"error": str(e)}), 502
+    return jsonify({"error": str(e)}), 400
+
+def degraded_prediction(box, reason):
+    """Answer for a box without Earth Engine, or None if there is nothing close enough.
+
+    Uses cached features of the nearest nearby box, else the nearest
+    precomputed grid cell within DEGRADED_MAX_KM. Answers that are not for
+    the box itself are flagged "degraded".
+    """
+    engine = model_store.get()
+    stats, distance_km = nearby_cached_stats(box)
+
+    if stats is not None:
+        with stage("features"):
+            X = feature_matrix([stats], engine.feature_names)
+        with stage("predict"):
+            payload = prediction_payload(*engine.predict(X)[0])
+        if distance_km == 0:
+            return payload
+        payload["source"] = "cache_nearby"
+    else:
+        west, south, east, north = box
+        village_grid = model_store.grid
+        hit = (village_grid.nearest((south + north) / 2, (west + east) / 2, DEGRADED_MAX_KM)
+               if village_grid else None)
+        if hit is None:
+            return None
+        i, distance_km = hit
+        payload = prediction_payload(*village_grid.predictions[i])
+        payload.update({"source": "grid", "cell": village_grid.names[i]})
+
+    payload.update({
+        "degraded": True,
+        "degraded_reason": reason,
+        "distance_km": round(distance_km, 3)
+    })
+    degraded_responses.inc(payload["source"])
+    return payload
+
+@app.route("/ready")
+def ready():
+    """Readiness probe: 200 once the models are loaded, 503 before that.
+
+    Starts the load itself while none has run yet (MODEL_LOAD=lazy) or the
+    last one failed, so the probe does not wait on traffic that waits on it.
+    """
+    if model_store.state in ("idle", "failed"):
+        try:
+            model_store.load()
+        except ModelsNotReady:
+            pass  # reported below
+    status = model_store.status()
+    status["feature_backend"] = FEATURE_BACKEND
+    status["earth_engine_initialized"] = ee_initialized()
+    status["earth_engine_breaker"] = ee_client.breaker.state
+    return jsonify(status), 200 if status["state"] == "ready" else 503
+
+@app.route("/metrics")
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(feature_cache.stats())
+
+def predict_point(lon, lat):
+    """Live path: EE features for one point, scored with the fused engine"""
+    engine = model_store.get()
+    try:
+        stats = get_band_stats(lon, lat)
+    except UNAVAILABLE as e:
+        payload = degraded_prediction(point_box(lon, lat), str(e))
+        if payload is None:
+            raise
+        return payload
+
+    with stage("features"):
+        X = feature_matrix([stats], engine.feature_names)
+
+    with stage("predict"):
+        N_avg, P_avg, K_avg = engine.predict(X).mean(axis=0)
+
+    return prediction_payload(N_avg, P_avg, K_avg)
+
 @app.route("/predict", methods=["POST"])
 def predict_nutrients():
     try:
@@ -156,27 +285,175 @@ def predict_nutrients():
         lat = float(data["lat"])
         print(f"📍 Predicting for Latitude={lat}, Longitude={lon}")
 
-        df = get_satellite_data(lon, lat)
-        df = df[n_model.feature_names_in_]
+        return json_response(predict_point(lon, lat))
 
-        n_pred = n_model.predict(df)
-        p_pred = p_model.predict(df)
-        k_pred = k_model.predict(df)
+    except Exception as e:
+        print("❌ Prediction error:", e)
+        return error_response(e)
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_nutrients_batch():
+    """Score many points/boxes with one Earth Engine call.
 
-        N_avg = float(np.mean(n_pred))
-        P_avg = float(np.mean(p_pred))
-        K_avg = float(np.mean(k_pred))
+    Body: {"points": [{"lat": .., "lon": .., "box_size": ..} | {"bbox": [w, s, e, n]}, ...]}
+    Returns {"results": [...]} in input order; failed entries carry an "error".
+    While Earth Engine is unavailable, entries are degraded answers where possible.
+    """
+    try:
+        data = request.get_json()
+        items = data["points"]
+        if not isinstance(items, list) or not items:
+            raise ValueError("'points' must be a non-empty list")
+        if len(items) > MAX_BATCH_POINTS:
+            raise ValueError(f"Too many points (max {MAX_BATCH_POINTS})")
+
+        results = [None] * len(items)
+        boxes, positions = [], []
+        for i, item in enumerate(items):
+            try:
+                boxes.append(parse_box(item))
+                positions.append(i)
+            except (KeyError, TypeError, ValueError) as e:
+                results[i] = {"error": f"Invalid point: {e}"}
+
+        print(f"📍 Batch predicting {len(boxes)} of {len(items)} points")
+
+        if boxes:
+            unavailable = None
+            try:
+                rows = get_satellite_data_batch(boxes)
+            except UNAVAILABLE as e:
+                unavailable, rows = e, [None] * len(boxes)
+
+            scored = []
+            for box, pos, row in zip(boxes, positions, rows):
+                if unavailable is not None:
+                    results[pos] = degraded_prediction(box, str(unavailable)) or {
+                        "error": f"Earth Engine unavailable: {unavailable}"
+                    }
+                elif row is None:
+                    results[pos] = {"error": "No cloud-free imagery for this location"}
+                else:
+                    scored.append((pos, row))
+
+            # Nothing to fall back on for any point: report the EE failure itself
+            if unavailable is not None and all("error" in results[pos] for pos in positions):
+                raise unavailable
+
+            if scored:
+                engine = model_store.get()
+                with stage("features"):
+                    X = feature_matrix([row for _, row in scored], engine.feature_names)
+                with stage("predict"):
+                    preds = engine.predict(X)
+
+                for j, (pos, _) in enumerate(scored):
+                    results[pos] = prediction_payload(*preds[j])
+
+        return json_response({"results": results})
 
-        return jsonify({
-            "Nitrogen_avg": N_avg,
-            "Phosphorus_avg": P_avg,
-            "Potassium_avg": K_avg,
-            "Suggestions": get_fertilizer_suggestion(N_avg, P_avg, K_avg)
+    except Exception as e:
+        print("❌ Batch prediction error:", e)
+        return error_response(e)
+
+@app.route("/predict/nearest", methods=["POST"])
+def predict_nearest():
+    """Answer from the nearest precomputed grid cell within max_km, else live.
+
+    Body: {"lat": .., "lon": .., "max_km": ..}
+    """
+    try:
+        data = request.get_json()
+        lon = float(data["lon"])
+        lat = float(data["lat"])
+        max_km = float(data.get("max_km", GRID_MAX_KM))
+
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("Invalid latitude / longitude")
+        if not (math.isfinite(max_km) and max_km >= 0):
+            raise ValueError("max_km must be a finite, non-negative number")
+
+        model_store.get()
+        village_grid = model_store.grid
+
+        hit = village_grid.nearest(lat, lon, max_km) if village_grid else None
+        if hit is None:
+            payload = predict_point(lon, lat)
+            payload.setdefault("source", "live")
+            return json_response(payload)
+
+        i, distance_km = hit
+        payload = prediction_payload(*village_grid.predictions[i])
+        payload.update({
+            "source": "grid",
+            "cell": village_grid.names[i],
+            "cell_lat": float(village_grid.coords[i, 0]),
+            "cell_lon": float(village_grid.coords[i, 1]),
+            "distance_km": round(distance_km, 3)
         })
+        return json_response(payload)
 
     except Exception as e:
-        print("❌ Prediction error:", e)
-        return jsonify({"error": str(e)}), 400
+        print("❌ Nearest prediction error:", e)
+        return error_response(e)
+
+@app.route("/predict/map", methods=["POST"])
+def predict_field_map():
+    """Per-pixel N/P/K over a field polygon.
+
+    Body: {"geometry": <GeoJSON Polygon/MultiPolygon/Feature>, "scale": 20,
+           "include_raster": true}
+    Returns field-average predictions, per-nutrient zone statistics and,
+    unless include_raster is false, a base64 float16 raster.
+    """
+    try:
+        data = request.get_json()
+        geometry = parse_geometry(data["geometry"])
+        scale = float(data.get("scale", MAP_DEFAULT_SCALE))
+        print(f"🗺 Mapping field at {scale:g} m")
+
+        engine = model_store.get()
+        zone_stats, raster, grid = predict_map(engine, geometry, scale)
+
+        payload = prediction_payload(*(zone_stats[n]["mean"] for n in
+                                       ("Nitrogen", "Phosphorus", "Potassium")))
+        payload.update({"zone_stats": zone_stats, "grid": grid})
+        if data.get("include_raster", True):
+            payload["raster"] = encode_raster(raster)
+
+        return json_response(payload)
+
+    except Exception as e:
+        print("❌ Map prediction error:", e)
+        return error_response(e)
+
+@app.route("/predict/timeseries", methods=["POST"])
+def predict_nutrient_timeseries():
+    """N/P/K per month or season over a date range, from one Earth Engine call.
+
+    Body: {"lat": .., "lon": .., "start": "2022-01-01", "end": "2023-12-31",
+           "period": "monthly" | "seasonal", "box_size": 0.1}
+    Returns parallel lists: periods, Nitrogen, Phosphorus, Potassium, pixels,
+    coverage and quality ("good", "low" or "no_data").
+    """
+    try:
+        data = request.get_json()
+        lon = float(data["lon"])
+        lat = float(data["lat"])
+        box_size = float(data.get("box_size", 0.1))
+        if not 0 < box_size <= MAX_BOX_SIZE:
+            raise ValueError(f"box_size must be in (0, {MAX_BOX_SIZE}]")
+        period = data.get("period", "monthly")
+        print(f"📅 {period} series for Latitude={lat}, Longitude={lon}")
+
+        engine = model_store.get()
+        return json_response(predict_timeseries(
+            engine, lon, lat, data["start"], data["end"], period, box_size
+        ))
+
+    except Exception as e:
+        print("❌ Time series error:", e)
+        return error_response(e)
 
 # -------------------------------
 # Run locally
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark: fused N/P/K engine vs. the DataFrame + 3x sklearn predict path.
+
+    python benchmarks/bench_inference.py [--rows 500] [--repeat 50]
+
+Uses the models in backend/models/ when present, otherwise fits synthetic
+forests the same way train_models.py does.
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from inference import MODEL_FILES, FusedForest, feature_matrix  # noqa: E402
+from simulated_ee import random_rows  # noqa: E402
+
+
+def load_or_fit_models():
+    paths = [os.path.join(BACKEND_DIR, "models", name) for name in MODEL_FILES]
+    if all(os.path.exists(p) for p in paths):
+        print("📦 Using models from backend/models/")
+        return [joblib.load(p) for p in paths]
+
+    from sklearn.ensemble import RandomForestRegressor
+
+    print("🧪 No trained models found, fitting synthetic forests")
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(random_rows(rng, 500))
+    targets = [
+        50 + 10 * X["NDVI"] + rng.normal(0, 2, len(X)),
+        30 + 5 * X["SAVI"] + rng.normal(0, 1, len(X)),
+        100 + 8 * X["BSI"] + rng.normal(0, 3, len(X)),
+    ]
+    return [RandomForestRegressor(n_estimators=100, random_state=42).fit(X, y)
+            for y in targets]
+
+
+def sklearn_path(models, rows):
+    """What app.py did before the fused engine"""
+    df = pd.DataFrame(rows)
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df.fillna(0, inplace=True)
+    df = df[models[0].feature_names_in_]
+    return np.column_stack([m.predict(df) for m in models])
+
+
+def fused_path(engine, rows):
+    return engine.predict(feature_matrix(rows, engine.feature_names))
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)), float(np.min(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500, help="batch size")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    models = load_or_fit_models()
+
+    t0 = time.perf_counter()
+    engine = FusedForest.from_models(models)
+    compile_ms = (time.perf_counter() - t0) * 1e3
+    print(f"⚙️  Compiled {sum(engine.n_trees)} trees / {len(engine.value)} nodes "
+          f"(depth {engine.depth}) in {compile_ms:.1f} ms")
+
+    rng = np.random.default_rng(0)
+    rows = random_rows(rng, args.rows, engine.feature_names)
+
+    expected = sklearn_path(models, rows)
+    actual = fused_path(engine, rows)
+    if not np.array_equal(expected, actual):
+        diff = np.abs(expected - actual).max()
+        sys.exit(f"❌ Fused engine differs from sklearn (max abs diff {diff})")
+    print(f"✅ Outputs identical on {args.rows} rows")
+
+    print(f"\n{'case':<22}{'sklearn ms':>12}{'fused ms':>12}{'speedup':>10}")
+    for label, batch in [("single row", rows[:1]), (f"batch of {args.rows}", rows)]:
+        old, _ = best_of(lambda: sklearn_path(models, batch), args.repeat)
+        new, _ = best_of(lambda: fused_path(engine, batch), args.repeat)
+        print(f"{label:<22}{old * 1e3:>12.3f}{new * 1e3:>12.3f}{old / new:>9.1f}x")
+
+    per_row_old, _ = best_of(lambda: sklearn_path(models, rows), args.repeat)
+    per_row_new, _ = best_of(lambda: fused_path(engine, rows), args.repeat)
+    print(f"{'per row (amortized)':<22}{per_row_old / args.rows * 1e6:>10.1f}µs"
+          f"{per_row_new / args.rows * 1e6:>10.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Micro-benchmarks for the CPU side of a prediction: feature construction,
+engine predict and JSON serialization.
+
+    python benchmarks/bench_micro.py [--repeat 2000] [--batch 500]
+    python benchmarks/bench_micro.py --baseline results/micro-abc123.json
+
+Times are the median per call in microseconds.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from common import BACKEND_DIR, compare, ensure_models, save_results
+
+sys.path.append(BACKEND_DIR)
+
+from ee_processor import stats_to_frame  # noqa: E402
+from inference import FusedForest, feature_matrix  # noqa: E402
+from simulated_ee import random_rows  # noqa: E402
+
+
+def median_us(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return round(float(np.median(times)) * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--output", help="results JSON path")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_LOAD", "lazy")
+    from app import app, prediction_payload
+
+    engine = FusedForest.load(os.path.join(ensure_models(), "fused"))
+    names = engine.feature_names
+
+    rng = np.random.default_rng(0)
+    row = random_rows(rng, 1)[0]
+    batch = random_rows(rng, args.batch)
+    X1 = feature_matrix([row], names)
+    Xb = feature_matrix(batch, names)
+    payload = prediction_payload(*engine.predict(X1)[0])
+    batch_payload = {"results": [dict(payload, index=i) for i in range(args.batch)]}
+    batch_repeat = max(args.repeat // 20, 20)
+
+    cases = {
+        "features_matrix_1": (lambda: feature_matrix([row], names), args.repeat),
+        "features_dataframe_1": (lambda: stats_to_frame([row])[names], args.repeat),
+        f"features_matrix_{args.batch}": (lambda: feature_matrix(batch, names), batch_repeat),
+        "predict_1": (lambda: engine.predict(X1), args.repeat),
+        f"predict_{args.batch}": (lambda: engine.predict(Xb), batch_repeat),
+        "json_dumps_1": (lambda: json.dumps(payload), args.repeat),
+        f"json_dumps_{args.batch}": (lambda: json.dumps(batch_payload), batch_repeat),
+    }
+
+    results = {}
+    for name, (fn, repeat) in cases.items():
+        results[name] = {"median_us": median_us(fn, repeat), "repeat": repeat}
+
+    with app.app_context():
+        from flask import jsonify
+        results["jsonify_1"] = {"median_us": median_us(lambda: jsonify(payload), args.repeat),
+                                "repeat": args.repeat}
+        results[f"jsonify_{args.batch}"] = {
+            "median_us": median_us(lambda: jsonify(batch_payload), batch_repeat),
+            "repeat": batch_repeat,
+        }
+
+    for name, r in results.items():
+        print(f"⏱  {name:<24} {r['median_us']:>10.1f} µs")
+
+    save_results("micro", results, args.output)
+    if args.baseline:
+        compare(results, args.baseline, ["median_us"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Startup benchmark: time from launching gunicorn to the first healthy
+response, and memory per worker once it is serving.
+
+    python benchmarks/bench_startup.py [--workers 2] [--no-preload] [--recompile]
+
+--recompile deletes models/fused/ first, which measures the cold path that
+unpickles the joblib models (roughly what every worker used to pay).
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+from common import BACKEND_DIR, child_pids, free_port, memory_kb, wait_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-preload", action="store_true")
+    parser.add_argument("--recompile", action="store_true")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    if args.recompile:
+        shutil.rmtree(os.path.join(BACKEND_DIR, "models", "fused"), ignore_errors=True)
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_PRELOAD="0" if args.no_preload else "1",
+    )
+
+    t0 = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        base = f"http://127.0.0.1:{port}"
+        if not wait_for(base + "/", t0 + args.timeout):
+            sys.exit("❌ Server never answered /")
+        first_ok = time.time() - t0
+
+        if not wait_for(base + "/ready", t0 + args.timeout):
+            sys.exit("❌ /ready never returned 200")
+        ready = time.time() - t0
+
+        time.sleep(1)  # let every worker finish booting
+        print(f"⏱  first healthy response: {first_ok * 1e3:.0f} ms, ready: {ready * 1e3:.0f} ms")
+
+        master_rss, master_pss = memory_kb(proc.pid)
+        print(f"🧠 master  RSS {master_rss / 1024:7.1f} MB  PSS {(master_pss or 0) / 1024:7.1f} MB")
+        for pid in child_pids(proc.pid):
+            rss, pss = memory_kb(pid)
+            print(f"🧠 worker  RSS {rss / 1024:7.1f} MB  PSS {(pss or 0) / 1024:7.1f} MB  (pid {pid})")
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
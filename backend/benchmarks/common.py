@@ -0,0 +1,131 @@
+"""Shared helpers for the benchmark scripts: server processes, memory, results."""
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# -------------------------------
+# Processes & Memory
+# -------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, deadline):
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+
+def child_pids(pid):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def memory_kb(pid):
+    """(RSS, PSS) in kB; PSS splits shared pages between the processes using them"""
+    rss = pss = None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def ensure_models():
+    """MODEL_DIR to benchmark with: backend/models, or small freshly trained ones"""
+    model_dir = os.environ.get("MODEL_DIR", os.path.join(BACKEND_DIR, "models"))
+    if os.path.exists(os.path.join(model_dir, "soil_nitrogen_model.joblib")):
+        return model_dir
+
+    model_dir = os.path.join(RESULTS_DIR, "models")
+    if not os.path.exists(os.path.join(model_dir, "fused", "manifest.json")):
+        print("🧪 No trained models found, training synthetic ones for the benchmark")
+        subprocess.run(
+            [sys.executable, "train_models.py", "--out", model_dir],
+            cwd=BACKEND_DIR, check=True, stdout=subprocess.DEVNULL
+        )
+    return model_dir
+
+
+# -------------------------------
+# Results
+# -------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(name, results, path=None):
+    """Write results as JSON (default benchmarks/results/<name>-<commit>.json)"""
+    commit = git_commit()
+    doc = {
+        "benchmark": name,
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    path = path or os.path.join(RESULTS_DIR, f"{name}-{commit}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(doc, f, indent=2)
+    print(f"💾 Results written to {path}")
+    return path
+
+
+def compare(results, baseline_path, keys):
+    """Print the change of each numeric metric in `keys` against a saved run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 vs {baseline['commit']} ({baseline_path})")
+    for case, metrics in results.items():
+        old = baseline["results"].get(case)
+        if not old:
+            continue
+        for key in keys:
+            if key in metrics and old.get(key):
+                change = (metrics[key] - old[key]) / old[key] * 100
+                print(f"   {case:<32} {key:<14} {old[key]:>10.3f} -> {metrics[key]:>10.3f} ({change:+.1f}%)")
@@ -0,0 +1,167 @@
+"""
+Load test: drive the API under gunicorn with the simulated Earth Engine
+backend and report throughput, latency percentiles and per-worker memory.
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --configs 1x8,2x32 --clients 64 --duration 20 \\
+        --latency-ms 800 --failure-rate 0.02 --baseline results/load-abc123.json
+
+Each config is <workers>x<threads>. One extra client polls "/" throughout to
+show whether slow EE calls starve unrelated requests.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from common import (
+    BACKEND_DIR, child_pids, compare, ensure_models, free_port, memory_kb,
+    save_results, wait_for
+)
+
+
+def client(port, stop, samples, hot_points, hot_fraction, path="/predict"):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    while not stop.is_set():
+        if path == "/":
+            method, body = "GET", None
+        else:
+            if random.random() < hot_fraction:
+                lat, lon = random.choice(hot_points)
+            else:
+                lat, lon = random.uniform(24, 30), random.uniform(77, 84)
+            method, body = "POST", json.dumps({"lat": lat, "lon": lon})
+
+        t0 = time.perf_counter()
+        try:
+            conn.request(method, path, body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = "conn_error"
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        samples.append((time.perf_counter() - t0, status))
+        if path == "/":
+            time.sleep(0.05)
+    conn.close()
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1e3, 2) if latencies else None
+
+
+def run_config(workers, threads, args, model_dir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        MODEL_DIR=model_dir,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(threads),
+        SIM_LATENCY_MS=str(args.latency_ms),
+        SIM_LATENCY_SIGMA=str(args.latency_sigma),
+        SIM_FAILURE_RATE=str(args.failure_rate),
+        SIM_HANG_RATE=str(args.hang_rate),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "benchmarks.simulated_app:app"],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not wait_for(f"http://127.0.0.1:{port}/ready", time.time() + 60):
+            raise SystemExit("❌ Server did not become ready")
+
+        hot_points = [(random.uniform(24, 30), random.uniform(77, 84)) for _ in range(20)]
+        stop = threading.Event()
+        predict_samples, root_samples = [], []
+        threads_ = [
+            threading.Thread(target=client, daemon=True,
+                             args=(port, stop, predict_samples, hot_points, args.hot_fraction))
+            for _ in range(args.clients)
+        ]
+        threads_.append(threading.Thread(
+            target=client, daemon=True,
+            args=(port, stop, root_samples, hot_points, 0, "/")
+        ))
+
+        peak = {}
+        t0 = time.time()
+        for t in threads_:
+            t.start()
+        while time.time() - t0 < args.duration:
+            time.sleep(1)
+            for pid in child_pids(proc.pid):
+                rss, pss = memory_kb(pid)
+                old = peak.get(pid, (0, 0))
+                peak[pid] = (max(old[0], rss or 0), max(old[1], pss or 0))
+        stop.set()
+        for t in threads_:
+            t.join(timeout=130)
+        elapsed = time.time() - t0
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    ok = [lat for lat, status in predict_samples if status == 200]
+    root = [lat for lat, _ in root_samples]
+    return {
+        "workers": workers,
+        "threads": threads,
+        "clients": args.clients,
+        "requests": len(predict_samples),
+        "throughput_rps": round(len(ok) / elapsed, 2),
+        "p50_ms": percentile_ms(ok, 50),
+        "p95_ms": percentile_ms(ok, 95),
+        "p99_ms": percentile_ms(ok, 99),
+        "status_counts": {str(k): v for k, v in Counter(s for _, s in predict_samples).items()},
+        "root_p99_ms": percentile_ms(root, 99),
+        "worker_rss_mb": [round(rss / 1024, 1) for rss, _ in peak.values()],
+        "worker_pss_mb": [round(pss / 1024, 1) for _, pss in peak.values()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--configs", default="1x8,2x16,2x32", help="comma-separated <workers>x<threads>")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per config")
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--hang-rate", type=float, default=0)
+    parser.add_argument("--hot-fraction", type=float, default=0.3,
+                        help="share of requests repeating one of 20 hot points (cache hits)")
+    parser.add_argument("--output", help="results JSON path")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    model_dir = ensure_models()
+    results = {}
+    for config in args.configs.split(","):
+        workers, threads = (int(v) for v in config.split("x"))
+        print(f"🚀 {workers} worker(s) x {threads} thread(s), {args.clients} clients, {args.duration:g}s")
+        r = results[config] = run_config(workers, threads, args, model_dir)
+        print(f"   {r['throughput_rps']} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  "
+              f"p99 {r['p99_ms']} ms  '/' p99 {r['root_p99_ms']} ms  statuses {r['status_counts']}")
+        print(f"   worker RSS {r['worker_rss_mb']} MB  PSS {r['worker_pss_mb']} MB")
+
+    save_results("load", results, args.output)
+    if args.baseline:
+        compare(results, args.baseline, ["throughput_rps", "p50_ms", "p95_ms", "p99_ms"])
+
+
+if __name__ == "__main__":
+    main()
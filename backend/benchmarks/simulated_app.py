@@ -0,0 +1,11 @@
+"""
+WSGI entry point for load tests: the API with Earth Engine simulated by
+simulated_ee.py. Never deploy this module; it answers with made-up data.
+
+    cd backend && gunicorn -c gunicorn.conf.py benchmarks.simulated_app:app
+"""
+import simulated_ee
+
+simulated_ee.install()
+
+from app import app  # noqa: E402,F401
@@ -0,0 +1,109 @@
+"""
+Precompute satellite features and N/P/K predictions for the village list
+(and optionally a regular grid) so /predict/nearest can answer without EE.
+
+    python build_grid.py
+    python build_grid.py --region 77.0,23.8,84.7,30.4 --step 0.1
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from ee_processor import (
+    BANDS, END_DATE, SCALE, START_DATE, TILE_DEG,
+    get_satellite_data_batch, point_box
+)
+from inference import MODEL_FILES, FusedForest, feature_matrix, model_version
+from village_grid import save_grid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+VILLAGES_PATH = os.path.join(BASE_DIR, "frontend", "village_coords.json")
+GRID_DIR = os.environ.get("VILLAGE_GRID_DIR", os.path.join(BASE_DIR, "grid"))
+
+
+def village_points(path):
+    with open(path, encoding="utf-8-sig") as f:
+        villages = json.load(f)
+    return [(name, float(lat), float(lon)) for name, (lat, lon) in villages.items()]
+
+
+def region_points(region, step):
+    west, south, east, north = region
+    lats = np.arange(south + step / 2, north, step)
+    lons = np.arange(west + step / 2, east, step)
+    return [
+        (None, round(float(lat), 6), round(float(lon), 6))
+        for lat in lats for lon in lons
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed village nutrient grid")
+    parser.add_argument("--villages", default=VILLAGES_PATH)
+    parser.add_argument("--region", help="west,south,east,north for an extra regular grid")
+    parser.add_argument("--step", type=float, default=0.1, help="regular grid spacing (degrees)")
+    parser.add_argument("--box-size", type=float, default=0.1)
+    parser.add_argument("--chunk", type=int, default=200, help="boxes per Earth Engine call")
+    parser.add_argument("--out", default=GRID_DIR)
+    args = parser.parse_args()
+
+    points = village_points(args.villages)
+    if args.region:
+        region = [float(v) for v in args.region.split(",")]
+        points += region_points(region, args.step)
+    print(f"📍 {len(points)} cells to compute")
+
+    models = [joblib.load(os.path.join(MODEL_DIR, name)) for name in MODEL_FILES]
+    engine = FusedForest.from_models(models)
+
+    names, coords, features, predictions = [], [], [], []
+    t0 = time.time()
+
+    for start in range(0, len(points), args.chunk):
+        chunk = points[start:start + args.chunk]
+        boxes = [point_box(lon, lat, args.box_size) for _, lat, lon in chunk]
+        rows = get_satellite_data_batch(boxes, timeout=None)
+
+        kept = [(p, row) for p, row in zip(chunk, rows) if row is not None]
+        if kept:
+            X = feature_matrix([row for _, row in kept], engine.feature_names)
+            preds = engine.predict(X)
+            for ((name, lat, lon), _), x, pred in zip(kept, X, preds):
+                names.append(name)
+                coords.append((lat, lon))
+                features.append(x)
+                predictions.append(pred)
+
+        print(f"🛰 {start + len(chunk)}/{len(points)} cells "
+              f"({len(chunk) - len(kept)} without imagery), {time.time() - t0:.0f}s")
+
+    if not names:
+        raise SystemExit("❌ No cell had cloud-free imagery, nothing written")
+
+    save_grid(
+        args.out, names,
+        coords=np.array(coords).reshape(-1, 2),
+        features=np.array(features).reshape(-1, len(engine.feature_names)),
+        predictions=np.array(predictions).reshape(-1, 3),
+        manifest={
+            "model_version": model_version(MODEL_DIR),
+            "bands": engine.feature_names,
+            "ee_bands": BANDS,
+            "start_date": START_DATE,
+            "end_date": END_DATE,
+            "scale": SCALE,
+            "box_size": args.box_size,
+            "tile_deg": TILE_DEG,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+    )
+    print(f"🎉 Wrote {len(names)} cells to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metrics import current_timings, ee_hedges, ee_retries, run_with_timings
+from serving import DeadlineExceeded, Overloaded
+
+# -------------------------------
+# 🛡 Resilient Earth Engine Calls
+# -------------------------------
+#
+# EEClient.call() runs one Earth Engine round trip on the bounded executor
+# with:
+#   * deadlines  each attempt waits at most EE_CALL_TIMEOUT_S (or an equal
+#                share of a longer caller timeout), all attempts together at
+#                most the caller's timeout;
+#   * hedging    once a call type has EE_HEDGE_MIN_SAMPLES latencies, an
+#                attempt still running after their p95 gets a duplicate; the
+#                first answer wins and the other is abandoned (it keeps its
+#                executor slot until EE returns, so the pool bound holds);
+#   * retries    quota / transient errors and attempt timeouts are retried
+#                EE_RETRIES times with full-jitter exponential backoff;
+#   * a breaker  when EE_BREAKER_THRESHOLD of the last EE_BREAKER_WINDOW
+#                calls failed (a call counts once, after its retries), calls fail fast with CircuitOpen for
+#                EE_BREAKER_COOLDOWN_S; then a single probe call decides
+#                whether it closes again.
+# Errors EE reports about the request itself (bad geometry, too many pixels)
+# are not retried and do not count towards the breaker, though as a probe
+# answer they close it; like exhausted retries they surface as UpstreamError.
+
+EE_CALL_TIMEOUT_S = float(os.environ.get("EE_CALL_TIMEOUT_S", 10))
+EE_RETRIES = int(os.environ.get("EE_RETRIES", 2))
+EE_RETRY_BASE_S = float(os.environ.get("EE_RETRY_BASE_S", 0.5))
+EE_HEDGE = os.environ.get("EE_HEDGE", "1") == "1"
+EE_HEDGE_QUANTILE = float(os.environ.get("EE_HEDGE_QUANTILE", 0.95))
+EE_HEDGE_MIN_SAMPLES = int(os.environ.get("EE_HEDGE_MIN_SAMPLES", 20))
+EE_HEDGE_MIN_S = float(os.environ.get("EE_HEDGE_MIN_S", 0.2))
+EE_BREAKER_WINDOW = int(os.environ.get("EE_BREAKER_WINDOW", 20))
+EE_BREAKER_MIN_CALLS = int(os.environ.get("EE_BREAKER_MIN_CALLS", 10))
+EE_BREAKER_THRESHOLD = float(os.environ.get("EE_BREAKER_THRESHOLD", 0.5))
+EE_BREAKER_COOLDOWN_S = float(os.environ.get("EE_BREAKER_COOLDOWN_S", 30))
+
+TRANSIENT_PATTERN = re.compile(
+    r"too many concurrent|quota|rate limit|too many requests|timed out|deadline"
+    r"|internal error|backend error|unavailable|temporarily|connection|\b(429|500|502|503|504)\b",
+    re.IGNORECASE
+)
+
+
+class CircuitOpen(Exception):
+    """Raised without calling EE while the breaker is open"""
+
+
+class UpstreamError(Exception):
+    """Raised when Earth Engine rejects a request or keeps failing"""
+
+
+# Failures after which the API can still give a degraded answer
+UNAVAILABLE = (CircuitOpen, UpstreamError, TimeoutError)
+
+
+def is_transient(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return bool(TRANSIENT_PATTERN.search(str(error)))
+
+
+class CircuitBreaker:
+    STATES = ("closed", "half_open", "open")
+
+    def __init__(self, window, min_calls, threshold, cooldown):
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.cooldown = cooldown
+
+        self.state = "closed"
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now - self._opened_at < self.cooldown:
+                    return False
+                self.state = "half_open"
+                self._probe_at = None
+
+            if self.state == "half_open":
+                # One probe at a time; a probe that never reported back
+                # (e.g. rejected as Overloaded) is replaced after a cooldown.
+                if self._probe_at is not None and now - self._probe_at < self.cooldown:
+                    return False
+                self._probe_at = now
+            return True
+
+    def record(self, ok):
+        with self._lock:
+            if self.state == "half_open":
+                if ok:
+                    self._close()
+                else:
+                    self._trip()
+                return
+
+            # Calls started before a trip may still finish while it is open
+            if self.state == "open":
+                return
+
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if (len(self._outcomes) >= self.min_calls
+                    and failures >= self.threshold * len(self._outcomes)):
+                self._trip()
+
+    def answered(self):
+        """EE rejected the request itself: no outcome, but proof it is reachable"""
+        with self._lock:
+            if self.state == "half_open":
+                self._close()
+
+    def _close(self):
+        self.state = "closed"
+        self._outcomes.clear()
+        print("✅ Earth Engine circuit breaker closed")
+
+    def _trip(self):
+        self.state = "open"
+        self.trips += 1
+        self._opened_at = time.monotonic()
+        self._probe_at = None
+        self._outcomes.clear()
+        print(f"🔌 Earth Engine circuit breaker open for {self.cooldown:g}s")
+
+
+class LatencyWindow:
+    """Recent successful call latencies per call type"""
+
+    def __init__(self, size=200):
+        self.size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, call, seconds):
+        with self._lock:
+            self._samples.setdefault(call, deque(maxlen=self.size)).append(seconds)
+
+    def quantile(self, call, q):
+        with self._lock:
+            samples = sorted(self._samples.get(call, ()))
+        if len(samples) < EE_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class EEClient:
+    def __init__(self, pool):
+        self.pool = pool
+        self.breaker = CircuitBreaker(
+            EE_BREAKER_WINDOW, EE_BREAKER_MIN_CALLS, EE_BREAKER_THRESHOLD, EE_BREAKER_COOLDOWN_S
+        )
+        self.latency = LatencyWindow()
+
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0,
+            "hedges_skipped": 0, "short_circuited": 0, "timed_out": 0, "failed": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _timed(self, fn, args, call, timings):
+        t0 = time.perf_counter()
+        result = run_with_timings(timings, fn, *args)
+        self.latency.observe(call, time.perf_counter() - t0)
+        return result
+
+    def hedge_delay(self, call):
+        if not EE_HEDGE:
+            return None
+        p = self.latency.quantile(call, EE_HEDGE_QUANTILE)
+        return None if p is None else max(p, EE_HEDGE_MIN_S)
+
+    def _attempt(self, fn, args, call, timeout):
+        """One attempt, hedged once it runs past the p95; waits at most timeout seconds"""
+        end = None if timeout is None else time.monotonic() + timeout
+        timings = current_timings()
+        primary = self.pool.submit(self._timed, fn, args, call, timings)
+        pending = {primary}
+        hedge = None
+
+        delay = self.hedge_delay(call)
+        if delay is not None and (timeout is None or delay < timeout):
+            if not wait(pending, timeout=delay).done:
+                try:
+                    # Only hedge onto an idle worker, never into the queue
+                    if self.pool.stats()["in_flight"] >= self.pool.max_workers:
+                        raise Overloaded
+                    hedge = self.pool.submit(self._timed, fn, args, call, timings)
+                    pending.add(hedge)
+                    self._count("hedges")
+                    ee_hedges.inc(call, "launched")
+                except Overloaded:
+                    # No spare capacity: keep waiting on the primary only
+                    self._count("hedges_skipped")
+                    ee_hedges.inc(call, "skipped")
+
+        error = None
+        while pending:
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                        ee_hedges.inc(call, "won")
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            raise error
+        self._count("timed_out")
+        raise DeadlineExceeded(f"Earth Engine did not answer within {timeout:g}s")
+
+    def call(self, fn, *args, call, timeout=None):
+        """Run fn(*args) on the pool with deadlines, hedging, retries and the breaker.
+
+        Raises Overloaded when the pool is full, CircuitOpen while EE is
+        failing, DeadlineExceeded when `timeout` runs out and UpstreamError
+        for anything else EE reports.
+        """
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpen("Earth Engine is temporarily unavailable")
+        self._count("calls")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        per_attempt = None if timeout is None else max(EE_CALL_TIMEOUT_S, timeout / (EE_RETRIES + 1))
+
+        for attempt in range(EE_RETRIES + 1):
+            if deadline is None:
+                attempt_timeout = None
+            else:
+                attempt_timeout = min(per_attempt, deadline - time.monotonic())
+
+            try:
+                result = self._attempt(fn, args, call, attempt_timeout)
+                self.breaker.record(True)
+                return result
+            except Overloaded:
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.answered()
+                    self._count("failed")
+                    raise UpstreamError(f"Earth Engine request failed: {e}") from e
+                error = e
+
+            delay = random.uniform(0, EE_RETRY_BASE_S * 2 ** attempt)
+            if (attempt == EE_RETRIES or self.breaker.state == "open"
+                    or (deadline is not None and time.monotonic() + delay >= deadline)):
+                break
+
+            print(f"⚠️ {call} failed ({error}); retry {attempt + 1}/{EE_RETRIES} in {delay:.2f}s")
+            self._count("retries")
+            ee_retries.inc(call)
+            time.sleep(delay)
+
+        # One outcome per call, whatever the number of attempts
+        self.breaker.record(False)
+        self._count("failed")
+        if isinstance(error, TimeoutError):
+            raise error
+        raise UpstreamError(f"Earth Engine request failed after {attempt + 1} attempt(s): {error}") from error
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_trips"] = self.breaker.trips
+        return stats
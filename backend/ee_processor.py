@@ -1,17 +1,31 @@
-import ee
 import os
 import json
+import math
 import numpy as np
-import pandas as pd
+
+from ee_client import EEClient
+from feature_cache import FeatureCache, make_key
+from metrics import ee_errors, stage
+from serving import BoundedExecutor, EE_DEADLINE_S, EE_MAX_CONCURRENCY, EE_MAX_QUEUE
+from tile_store import TILE_STORE_DIR, TileStore
 
 # -------------------------------
 # 🌍 Earth Engine Initialization
 # -------------------------------
 
-PROJECT_ID = "calm-acre-472904-c1"
+PROJECT_ID = os.environ.get("EE_PROJECT_ID", "calm-acre-472904-c1")
+
+# The Earth Engine client is slow to import, so it is only loaded by the
+# first init_ee() call; every function below that touches `ee` runs after it.
+ee = None
+
 
 def init_ee():
+    global ee
     try:
+        if ee is None:
+            import ee
+
         if ee.data._initialized:
             return
 
@@ -30,6 +44,10 @@ def init_ee():
         raise
 
 
+def ee_initialized():
+    return ee is not None and bool(ee.data._initialized)
+
+
 # -------------------------------
 # ☁ Cloud Mask
 # -------------------------------
@@ -68,47 +86,375 @@ def add_indices(image):
 
 
 # -------------------------------
-# 📡 Main Function
+# 🧱 Composite
 # -------------------------------
 
-def get_satellite_data(lon, lat, box_size=0.1):
-    """Return Sentinel-2 stats as pandas DataFrame"""
-
-    # 🔐 Safe EE init
-    init_ee()
+BANDS = ['B2', 'B3', 'B4', 'B8', 'B11', 'B12', 'NDVI', 'NDMI', 'SAVI', 'BSI']
 
-    # ✅ Coordinate validation
-    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
-        raise ValueError("Invalid latitude / longitude")
+START_DATE = "2023-03-01"
+END_DATE = "2023-05-30"
+SCALE = 200
 
-    geom = ee.Geometry.Rectangle([
-        lon - box_size / 2, lat - box_size / 2,
-        lon + box_size / 2, lat + box_size / 2
-    ])
 
+def build_composite(region):
+    """Cloud-masked spring median composite over a region"""
     col = (
         ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
-        .filterBounds(geom)
-        .filterDate("2023-03-01", "2023-05-30")
+        .filterBounds(region)
+        .filterDate(START_DATE, END_DATE)
         .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", 15))
         .map(mask_clouds)
         .map(add_indices)
     )
 
-    img = col.median()
+    return col.median().select(BANDS)
+
+
+# -------------------------------
+# 🗂 Feature Cache
+# -------------------------------
+
+# Points are snapped to this grid (degrees) so nearby clicks share a cache
+# entry. 0.005° is ~500 m, i.e. at most 2.5% of the default 0.1° box.
+TILE_DEG = float(os.environ.get("FEATURE_CACHE_TILE_DEG", 0.005))
+
+feature_cache = FeatureCache(
+    max_entries=int(os.environ.get("FEATURE_CACHE_SIZE", 4096)),
+    db_path=os.environ.get("FEATURE_CACHE_DB") or None
+)
+
+
+def snap(value):
+    if TILE_DEG <= 0:
+        return value
+    return round(round(value / TILE_DEG) * TILE_DEG, 6)
+
+
+def point_box(lon, lat, box_size=0.1):
+    """[west, south, east, north] of the box around the snapped point"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Invalid latitude / longitude")
+
+    lon, lat = snap(lon), snap(lat)
+    box = [
+        lon - box_size / 2, lat - box_size / 2,
+        lon + box_size / 2, lat + box_size / 2
+    ]
+    # One out-of-range rectangle fails a whole shared reduceRegions call
+    if not (-90 <= box[1] and box[3] <= 90 and -180 <= box[0] and box[2] <= 180):
+        raise ValueError("Box extends beyond valid latitude / longitude")
+    return box
+
+
+def box_key(box):
+    return make_key(box, START_DATE, END_DATE, SCALE, BANDS)
+
+
+# -------------------------------
+# 🧱 Feature Backend
+# -------------------------------
+
+# FEATURE_BACKEND=tiles answers box means from the local tile store (see
+# tile_store.py) and only calls Earth Engine for boxes it does not cover.
+# Simulated Earth Engine data is never selected here: only the benchmark
+# entry point (benchmarks/simulated_app.py) swaps it in, and /ready reports
+# the backend in use.
+FEATURE_BACKENDS = ("ee", "tiles")
+FEATURE_BACKEND = os.environ.get("FEATURE_BACKEND", "ee")
+if FEATURE_BACKEND not in FEATURE_BACKENDS:
+    raise ValueError(f"FEATURE_BACKEND must be one of {', '.join(FEATURE_BACKENDS)}, not {FEATURE_BACKEND!r}")
+
+tile_store = TileStore(TILE_STORE_DIR) if FEATURE_BACKEND == "tiles" else None
+
+
+def local_box_stats(box):
+    if tile_store is None:
+        return None
+    with stage("tile_lookup"):
+        return tile_store.box_stats(box)
+
+
+# -------------------------------
+# 🚦 EE Call Executor
+# -------------------------------
+
+# Every EE round trip goes through ee_client: deadlines, hedging, retries
+# and the circuit breaker on top of the bounded pool (see ee_client.py).
+ee_pool = BoundedExecutor(EE_MAX_CONCURRENCY, EE_MAX_QUEUE)
+ee_client = EEClient(ee_pool)
+
+
+# -------------------------------
+# 📡 Main Function
+# -------------------------------
+
+def get_info(computed, call):
+    """Evaluate an EE object, timing it and counting failures per call type"""
+    try:
+        with stage("ee_getinfo"):
+            return computed.getInfo()
+    except Exception as e:
+        ee_errors.inc(call, type(e).__name__)
+        raise
+
+
+def fetch_box_stats(box):
+    """Mean band values over one box, straight from Earth Engine"""
+
+    # 🔐 Safe EE init
+    with stage("ee_init"):
+        init_ee()
+
+    with stage("ee_build"):
+        geom = ee.Geometry.Rectangle(box)
+
+        stats = build_composite(geom).reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=geom,
+            scale=SCALE,
+            maxPixels=1e8
+        )
+
+    return get_info(stats, "reduceRegion")
+
+
+def get_band_stats(lon, lat, box_size=0.1, timeout=EE_DEADLINE_S):
+    """Return Sentinel-2 band means for a point as a dict (cached).
+
+    Cache misses go through ee_client; raises Overloaded when the pool is
+    full, DeadlineExceeded after `timeout` seconds and CircuitOpen /
+    UpstreamError when Earth Engine is failing.
+    """
+    box = point_box(lon, lat, box_size)
+
+    stats = local_box_stats(box)
+    if stats is not None:
+        return stats
+
+    with stage("satellite_features"):
+        return feature_cache.get_or_compute(
+            box_key(box),
+            lambda: ee_client.call(fetch_box_stats, box, call="reduceRegion", timeout=timeout),
+            timeout=timeout
+        )
+
+
+# Degraded answers look this many snap steps around a box for cached features
+DEGRADED_CACHE_STEPS = int(os.environ.get("DEGRADED_CACHE_STEPS", 4))
+
+
+def nearby_cached_stats(box):
+    """Cached band means for the nearest same-size box within DEGRADED_CACHE_STEPS
+    snap steps, as (stats, distance_km), or (None, None). Never calls Earth Engine.
+    """
+    if TILE_DEG <= 0:
+        return None, None
+
+    west, south, east, north = box
+    lon, lat = (west + east) / 2, (south + north) / 2
+    box_size = east - west
+    kx = math.cos(math.radians(lat))
+
+    r = DEGRADED_CACHE_STEPS
+    offsets = sorted(
+        ((dx, dy) for dx in range(-r, r + 1) for dy in range(-r, r + 1)),
+        key=lambda d: (d[0] * kx) ** 2 + d[1] ** 2
+    )
+    for dx, dy in offsets:
+        try:
+            candidate = point_box(lon + dx * TILE_DEG, lat + dy * TILE_DEG, box_size)
+        except ValueError:
+            continue
+        stats = feature_cache.peek(box_key(candidate))
+        if stats is not None and any(v is not None for v in stats.values()):
+            return stats, math.hypot(dx * kx, dy) * TILE_DEG * 111.32
+    return None, None
+
+
+def get_satellite_data(lon, lat, box_size=0.1):
+    """Return Sentinel-2 stats as pandas DataFrame"""
+    return stats_to_frame([get_band_stats(lon, lat, box_size)])
+
+
+def reduce_boxes(boxes, indices):
+    """Mean band values for boxes[i], i in indices, in one reduceRegions call"""
+    with stage("ee_init"):
+        init_ee()
+
+    with stage("ee_build"):
+        fc = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Rectangle(boxes[i]), {"idx": i})
+            for i in indices
+        ])
+
+        reduced = build_composite(fc.geometry()).reduceRegions(
+            collection=fc,
+            reducer=ee.Reducer.mean(),
+            scale=SCALE
+        )
+
+    return get_info(reduced, "reduceRegions")
 
-    bands = ['B2', 'B3', 'B4', 'B8', 'B11', 'B12', 'NDVI', 'NDMI', 'SAVI', 'BSI']
 
-    stats = img.select(bands).reduceRegion(
-        reducer=ee.Reducer.mean(),
-        geometry=geom,
-        scale=200,
-        maxPixels=1e8
-    ).getInfo()
+def get_satellite_data_batch(boxes, timeout=EE_DEADLINE_S):
+    """Return one band-stats dict per [west, south, east, north] box, in input order.
 
-    df = pd.DataFrame([stats])
+    Boxes in the tile store or the cache are served locally; the rest share a single composite and a
+    single reduceRegions call, so the batch costs at most one Earth Engine
+    round trip. Boxes with no cloud-free pixels come back as None.
+    """
+    keys = [box_key(box) for box in boxes]
+    stats = [local_box_stats(box) for box in boxes]
+    stats = [s if s is not None else feature_cache.get(key) for s, key in zip(stats, keys)]
+    missing = [i for i, s in enumerate(stats) if s is None]
+
+    if missing:
+        with stage("satellite_features"):
+            reduced = ee_client.call(
+                reduce_boxes, boxes, missing, call="reduceRegions", timeout=timeout
+            )
+
+        for feature in reduced["features"]:
+            props = feature["properties"]
+            i = int(props["idx"])
+            stats[i] = {b: props.get(b) for b in BANDS}
+            feature_cache.put(keys[i], stats[i])
+
+    return [
+        s if s is not None and any(v is not None for v in s.values()) else None
+        for s in stats
+    ]
+
+
+# -------------------------------
+# 📅 Time Series
+# -------------------------------
+
+def reduce_periods(box, periods):
+    """Band means and cloud-free pixel counts over one box for every period.
+
+    `periods` is a list of (label, start, end) with ISO dates, end exclusive.
+    Each period's composite becomes bands "p<i>_<band>" of one stacked image,
+    reduced once with mean + count, so the whole series is a single
+    reduceRegion call. Properties come back as "p<i>_<band>_mean" and
+    "p<i>_<band>_count".
+    """
+    with stage("ee_init"):
+        init_ee()
+
+    with stage("ee_build"):
+        geom = ee.Geometry.Rectangle(box)
+        col = (
+            ee.ImageCollection("COPERNICUS/S2_SR_HARMONIZED")
+            .filterBounds(geom)
+            .filterDate(periods[0][1], periods[-1][2])
+            .filter(ee.Filter.lt("CLOUDY_PIXEL_PERCENTAGE", 15))
+            .map(mask_clouds)
+            .map(add_indices)
+        )
+        # Periods without a single scene get a fully masked stand-in
+        empty = ee.Image.constant([0] * len(BANDS)).rename(BANDS).updateMask(0)
+
+        composites = []
+        for i, (_, start, end) in enumerate(periods):
+            period = col.filterDate(start, end)
+            composite = ee.Image(ee.Algorithms.If(
+                period.size().gt(0), period.median().select(BANDS), empty
+            ))
+            composites.append(composite.rename([f"p{i}_{b}" for b in BANDS]))
+
+        stats = ee.Image.cat(composites).reduceRegion(
+            reducer=ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True),
+            geometry=geom,
+            scale=SCALE,
+            maxPixels=1e9
+        )
+
+    return get_info(stats, "reduceRegion_periods")
+
+
+def get_period_stats(lon, lat, periods, box_size=0.1, timeout=EE_DEADLINE_S, cache=True):
+    """[(band means dict or None, cloud-free pixel count), ...] per period.
+
+    The feature cache never expires entries, so pass cache=False for series
+    that reach recent dates, where new scenes can still arrive.
+    """
+    box = point_box(lon, lat, box_size)
+
+    def fetch():
+        return ee_client.call(reduce_periods, box, periods, call="reduceRegion_periods",
+                              timeout=timeout)
+
+    with stage("satellite_features"):
+        if cache:
+            key = make_key(box, periods[0][1], periods[-1][2], SCALE, BANDS) + "|" + ",".join(
+                label for label, _, _ in periods
+            )
+            raw = feature_cache.get_or_compute(key, fetch, timeout=timeout)
+        else:
+            raw = fetch()
+
+    out = []
+    for i in range(len(periods)):
+        count = int(raw.get(f"p{i}_B2_count") or 0)
+        stats = {b: raw.get(f"p{i}_{b}_mean") for b in BANDS}
+        out.append((stats if count else None, count))
+    return out
+
+
+# -------------------------------
+# 🧮 Pixel Blocks
+# -------------------------------
+
+def fetch_pixel_block(geometry, west, north, step, width, height):
+    """Composite pixels for one EPSG:4326 block as a (height, width, 12) float32 array.
+
+    Channels are BANDS, then "valid" (1 where every band has a cloud-free
+    value inside `geometry`) and "inside" (1 inside `geometry`). Masked band
+    values are returned as 0.
+    """
+    with stage("ee_init"):
+        init_ee()
+
+    with stage("ee_build"):
+        geom = ee.Geometry(geometry)
+        stack = build_composite(geom).clip(geom).toFloat()
+        valid = stack.mask().reduce(ee.Reducer.min()).gt(0).rename("valid")
+        inside = ee.Image.constant(1).clip(geom).mask().rename("inside")
+        image = stack.unmask(0).addBands([
+            valid.unmask(0).toFloat(), inside.unmask(0).toFloat()
+        ])
+
+    try:
+        with stage("ee_compute_pixels"):
+            pixels = ee.data.computePixels({
+                "expression": image,
+                "fileFormat": "NUMPY_NDARRAY",
+                "grid": {
+                    "dimensions": {"width": width, "height": height},
+                    "affineTransform": {
+                        "scaleX": step, "shearX": 0, "translateX": west,
+                        "shearY": 0, "scaleY": -step, "translateY": north
+                    },
+                    "crsCode": "EPSG:4326"
+                }
+            })
+    except Exception as e:
+        ee_errors.inc("computePixels", type(e).__name__)
+        raise
+
+    return np.stack(
+        [pixels[b] for b in BANDS + ["valid", "inside"]], axis=-1
+    ).astype(np.float32)
+
+
+def stats_to_frame(rows):
+    import pandas as pd
+
+    df = pd.DataFrame(rows, columns=BANDS)
 
     df.replace([np.inf, -np.inf], np.nan, inplace=True)
     df.fillna(0, inplace=True)
 
     return df
+
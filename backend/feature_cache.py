@@ -0,0 +1,208 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -------------------------------
+# 🗂 Satellite Feature Cache
+# -------------------------------
+#
+# Two tiers:
+#   1. in-process LRU (bounded by entry count)
+#   2. optional SQLite file shared by every gunicorn worker on the host
+#
+# Concurrent misses for the same key are coalesced: the first caller runs the
+# Earth Engine query, the others wait for its result.
+
+
+def make_key(bounds, start, end, scale, bands):
+    """Cache key for one box/date-range/scale/band-list query"""
+    return "|".join([
+        ",".join(f"{v:.6f}" for v in bounds),
+        start, end, str(scale), ",".join(bands)
+    ])
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class FeatureCache:
+    def __init__(self, max_entries=4096, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._inflight = {}
+
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+
+        self.counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "evictions": 0,
+        }
+
+    # ---- SQLite tier ----
+
+    def _conn(self):
+        # Connections must not cross a fork, so open one per process.
+        if self._db is None or self._db_pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS features "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.commit()
+            self._db = conn
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _disk_get(self, key):
+        if not self.db_path:
+            return None
+        try:
+            with self._db_lock:
+                row = self._conn().execute(
+                    "SELECT value FROM features WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print("⚠️ Feature cache read failed:", e)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def _disk_put(self, key, value):
+        if not self.db_path:
+            return
+        try:
+            with self._db_lock:
+                conn = self._conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO features (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time())
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            print("⚠️ Feature cache write failed:", e)
+
+    # ---- LRU tier ----
+
+    def _memory_get(self, key):
+        value = self._lru.get(key)
+        if value is not None:
+            self._lru.move_to_end(key)
+        return value
+
+    def _memory_put(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    # ---- Public API ----
+
+    def _lookup(self, key):
+        """Memory then disk; counts hits, leaves counting a miss to the caller"""
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.counters["hits"] += 1
+                return value
+
+        value = self._disk_get(key)
+
+        if value is not None:
+            with self._lock:
+                self.counters["disk_hits"] += 1
+                self._memory_put(key, value)
+        return value
+
+    def get(self, key):
+        """Return the cached value or None, checking memory then disk"""
+        value = self._lookup(key)
+        if value is None:
+            with self._lock:
+                self.counters["misses"] += 1
+        return value
+
+    def peek(self, key):
+        """Like get(), but without counting the lookup or promoting the entry"""
+        with self._lock:
+            value = self._lru.get(key)
+        return value if value is not None else self._disk_get(key)
+
+    def put(self, key, value):
+        with self._lock:
+            self._memory_put(key, value)
+        self._disk_put(key, value)
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """Return the cached value, or run compute() once for all concurrent callers.
+
+        Callers waiting on another caller's computation give up after
+        `timeout` seconds with TimeoutError. Only the caller that computes
+        counts as a miss; the ones waiting on it count as coalesced.
+        """
+        value = self._lookup(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.counters["hits"] += 1
+                return value
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            if not flight.event.wait(timeout):
+                raise TimeoutError("Timed out waiting for a concurrent identical request")
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = compute()
+            self.put(key, value)
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._lru)
+            stats["max_entries"] = self.max_entries
+            stats["in_flight"] = len(self._inflight)
+        stats["disk"] = bool(self.db_path)
+        return stats
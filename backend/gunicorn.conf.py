@@ -0,0 +1,20 @@
+import os
+
+# -------------------------------
+# Gunicorn Settings
+# -------------------------------
+# gthread workers serve many requests per process: a request blocked on
+# Earth Engine only holds a thread, not the whole worker. Earth Engine calls
+# themselves are bounded per worker by EE_MAX_CONCURRENCY + EE_MAX_QUEUE
+# (see serving.py); keep `threads` above that so cache hits and "/" still
+# have threads to run on while EE is slow.
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", 32))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+
+# Import the app (and map the compiled models) once in the master; workers
+# fork with it already loaded and share those pages copy-on-write.
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
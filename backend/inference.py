@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# -------------------------------
+# 📦 Model Files
+# -------------------------------
+
+MODEL_FILES = [
+    "soil_nitrogen_model.joblib",
+    "soil_phosphorus_model.joblib",
+    "soil_potassium_model.joblib",
+]
+
+
+def model_version(model_dir):
+    """Short content hash of the N/P/K model files, used to spot stale artifacts"""
+    digest = hashlib.sha256()
+    for name in MODEL_FILES:
+        with open(os.path.join(model_dir, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def replace_dir(tmp_dir, out_dir):
+    """Swap a fully written tmp_dir in as out_dir using renames only.
+
+    Running workers may have the old .npy files memory-mapped; they are
+    unlinked (their pages stay valid) instead of truncated, and a reader
+    never sees an old manifest next to new arrays.
+    """
+    old_dir = None
+    if os.path.exists(out_dir):
+        old_dir = f"{out_dir}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+# -------------------------------
+# ⚡ Fused N/P/K Inference Engine
+# -------------------------------
+#
+# The three RandomForestRegressor models are flattened into one set of node
+# arrays and evaluated together: every tree of every model walks the same
+# float32 feature matrix in lock-step, one NumPy step per tree level.
+#
+# Outputs match sklearn exactly:
+#   * sklearn compares float32 features against float64 thresholds; storing
+#     each threshold as the largest float32 <= the original keeps every
+#     comparison identical.
+#   * leaf values stay float64 and are summed tree by tree in estimator
+#     order, like RandomForestRegressor.predict.
+
+
+def float32_floor(values):
+    """Largest float32 <= each float64 value"""
+    values = np.asarray(values, dtype=np.float64)
+    t32 = values.astype(np.float32)
+    over = t32.astype(np.float64) > values
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return t32
+
+
+def feature_matrix(rows, feature_names):
+    """float32 matrix from band-stat dicts, no DataFrame.
+
+    Missing, NaN and infinite values become 0, like stats_to_frame.
+    """
+    X = np.array(
+        [[np.nan if row[name] is None else row[name] for name in feature_names]
+         for row in rows],
+        dtype=np.float32
+    ).reshape(len(rows), len(feature_names))
+    X[~np.isfinite(X)] = 0
+    return X
+
+
+ENGINE_FORMAT = 1
+ENGINE_ARRAYS = ["feature", "threshold", "value", "roots", "children", "is_leaf"]
+
+
+class FusedForest:
+    """Array-backed evaluator for several forests sharing one feature order"""
+
+    def __init__(self, feature_names, left, right, feature, threshold, value,
+                 roots, n_trees, depth, children=None, is_leaf=None):
+        self.feature_names = list(feature_names)
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.n_trees = list(n_trees)
+        self.depth = int(depth)
+
+        # Lookup tables for predict(); stored in the artifact so they are
+        # memory-mapped too instead of rebuilt on every worker's heap.
+        if children is None:
+            children = np.column_stack([left, right]).ravel()
+        if is_leaf is None:
+            is_leaf = left == np.arange(len(left))
+        self.children = children
+        self.is_leaf = is_leaf
+
+    def save(self, out_dir, **manifest):
+        """Write one .npy per array plus manifest.json (written last)"""
+        os.makedirs(out_dir, exist_ok=True)
+        for name in ENGINE_ARRAYS:
+            np.save(os.path.join(out_dir, f"{name}.npy"), getattr(self, name))
+
+        manifest = dict(
+            manifest,
+            format=ENGINE_FORMAT,
+            feature_names=self.feature_names,
+            n_trees=self.n_trees,
+            depth=self.depth
+        )
+        tmp = os.path.join(out_dir, "manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(out_dir, "manifest.json"))
+
+    @staticmethod
+    def read_manifest(engine_dir):
+        with open(os.path.join(engine_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != ENGINE_FORMAT:
+            raise ValueError(f"Unsupported engine format {manifest.get('format')}")
+        return manifest
+
+    @classmethod
+    def load(cls, engine_dir, mmap_mode="r"):
+        """Open a saved engine; with mmap_mode the arrays stay in the page cache"""
+        manifest = cls.read_manifest(engine_dir)
+        arrays = {
+            name: np.load(os.path.join(engine_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in ENGINE_ARRAYS
+        }
+        children = arrays["children"]
+        return cls(
+            manifest["feature_names"],
+            left=children[0::2],
+            right=children[1::2],
+            n_trees=manifest["n_trees"],
+            depth=manifest["depth"],
+            **arrays
+        )
+
+    @classmethod
+    def from_models(cls, models):
+        """Compile fitted RandomForestRegressor models, one output column each"""
+        feature_names = list(models[0].feature_names_in_)
+        for model in models[1:]:
+            if list(model.feature_names_in_) != feature_names:
+                raise ValueError("All models must share the same feature order")
+
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        n_trees = []
+        offset = 0
+        depth = 0
+
+        for model in models:
+            n_trees.append(len(model.estimators_))
+            for est in model.estimators_:
+                tree = est.tree_
+                ids = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+
+                # Leaves point at themselves; predict() marks them via this
+                # self-loop instead of keeping sklearn's -1 sentinel.
+                left.append(np.where(is_leaf, ids, tree.children_left) + offset)
+                right.append(np.where(is_leaf, ids, tree.children_right) + offset)
+                feature.append(np.where(is_leaf, 0, tree.feature))
+                threshold.append(float32_floor(tree.threshold))
+                value.append(tree.value[:, 0, 0])
+                roots.append(offset)
+
+                offset += tree.node_count
+                depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature_names,
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            n_trees=n_trees,
+            depth=depth
+        )
+
+    def predict(self, X):
+        """(n_rows, n_features) float32 -> (n_rows, n_models) float64"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        n_total = len(self.roots)
+
+        # One slot per (row, tree); only slots not yet at a leaf are advanced.
+        flat_x = X.ravel()
+        node = np.tile(self.roots, n)
+        row_base = np.repeat(np.arange(n, dtype=np.int64) * n_features, n_total)
+        active = np.flatnonzero(~self.is_leaf[node])
+
+        for _ in range(self.depth):
+            if not active.size:
+                break
+            cur = node[active]
+            go_right = flat_x[row_base[active] + self.feature[cur]] > self.threshold[cur]
+            nxt = self.children[2 * cur + go_right]
+            node[active] = nxt
+            active = active[~self.is_leaf[nxt]]
+
+        leaf = self.value[node].reshape(n, n_total)
+
+        out = np.empty((n, len(self.n_trees)))
+        start = 0
+        for j, count in enumerate(self.n_trees):
+            # cumsum adds sequentially, matching sklearn's per-tree accumulation
+            out[:, j] = leaf[:, start:start + count].cumsum(axis=1)[:, -1] / count
+            start += count
+        return out
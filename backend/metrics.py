@@ -0,0 +1,233 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# -------------------------------
+# 📊 Metrics
+# -------------------------------
+#
+# A small Prometheus-compatible registry (text format 0.0.4) with no extra
+# dependency. Values are per process: with several gunicorn workers each
+# scrape sees the worker that answered it, so scrape per pod/worker or
+# aggregate with sum()/rate() as usual.
+#
+# stage("name") times a block into stage_seconds{stage="name"} and, when
+# called on a request thread, also records it for the Server-Timing header.
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1, 2.5, 5, 10, 25, 60
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _set(self, label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, v in items:
+            yield self.name + _label_str(self.labels, values), v
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        self._set(label_values, value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        names = self.labels + ("le",)
+        for values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield self.name + "_bucket" + _label_str(names, values + (bound,)), cumulative
+            yield self.name + "_sum" + _label_str(self.labels, values), total
+            yield self.name + "_count" + _label_str(self.labels, values), cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, fn):
+        """fn() returns metrics computed at scrape time (e.g. cache stats)"""
+        self._collectors.append(fn)
+
+    def render(self):
+        metrics = list(self._metrics)
+        for fn in self._collectors:
+            metrics.extend(fn())
+
+        lines = []
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, value in m.samples():
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "soil_stage_seconds", "Time spent in each stage of the prediction path", ["stage"]
+)
+request_seconds = registry.histogram(
+    "soil_request_seconds", "End-to-end request latency", ["endpoint", "status"]
+)
+requests_in_flight = registry.gauge(
+    "soil_requests_in_flight", "Requests currently being handled"
+)
+ee_errors = registry.counter(
+    "soil_ee_errors_total", "Failed Earth Engine calls", ["call", "error"]
+)
+ee_hedges = registry.counter(
+    "soil_ee_hedges_total", "Hedged Earth Engine attempts by outcome", ["call", "outcome"]
+)
+ee_retries = registry.counter(
+    "soil_ee_retries_total", "Earth Engine calls retried after a transient error", ["call"]
+)
+degraded_responses = registry.counter(
+    "soil_degraded_responses_total", "Predictions answered without Earth Engine, by source", ["source"]
+)
+
+
+def snapshot(name, help, kind, values, label=None):
+    """Build a scrape-time metric from a {label_value: number} dict (or a number)"""
+    metric = (Counter if kind == "counter" else Gauge)(name, help, (label,) if label else ())
+    if label:
+        for key, value in values.items():
+            metric._set((key,), value)
+    else:
+        metric._set((), values)
+    return metric
+
+
+# -------------------------------
+# ⏱ Per-request Stage Timing
+# -------------------------------
+
+_request = threading.local()
+
+
+def start_request():
+    _request.timings = []
+    _request.started = time.perf_counter()
+
+
+def finish_request():
+    """Return (total seconds, [(stage, seconds), ...]) for this request"""
+    timings = getattr(_request, "timings", None)
+    if timings is None:
+        return None, []
+    total = time.perf_counter() - _request.started
+    _request.timings = None
+    return total, timings
+
+
+def current_timings():
+    """This request's stage list, to hand to work started on another thread"""
+    return getattr(_request, "timings", None)
+
+
+def run_with_timings(timings, fn, *args, **kwargs):
+    """Run fn on this thread, recording its stages into another thread's request.
+
+    EE calls run on executor threads, which have no request of their own;
+    without this their ee_init / ee_build / ee_getinfo stages would be
+    missing from Server-Timing.
+    """
+    previous = getattr(_request, "timings", None)
+    _request.timings = timings
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _request.timings = previous
+
+
+@contextmanager
+def stage(name):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        stage_seconds.observe(elapsed, name)
+        timings = getattr(_request, "timings", None)
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def server_timing(total, timings):
+    # Stages that run more than once (e.g. per map block) are summed
+    merged = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+
+    parts = [f"{name};dur={seconds * 1e3:.2f}" for name, seconds in merged.items()]
+    parts.append(f"total;dur={total * 1e3:.2f}")
+    return ", ".join(parts)
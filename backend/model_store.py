@@ -0,0 +1,126 @@
+import os
+import shutil
+import threading
+import time
+
+from ee_processor import BANDS
+from inference import MODEL_FILES, FusedForest, model_version, replace_dir
+from village_grid import load_grid
+
+# -------------------------------
+# 📦 Model Store
+# -------------------------------
+#
+# Serving uses the compiled FusedForest, saved next to the joblib models in
+# models/fused/ as plain .npy files. Those are opened memory-mapped, so:
+#   * startup is a handful of np.load calls, with no unpickling and no sklearn
+#     import;
+#   * every gunicorn worker maps the same page-cache pages, with or without
+#     preload_app.
+# The joblib models are only unpickled when the compiled copy is missing or
+# was built from different model files; the result is written back for next
+# time.
+
+
+class ModelsNotReady(Exception):
+    """Raised when the models are missing or failed to load (503, like /ready)"""
+
+
+class ModelStore:
+    def __init__(self, model_dir, grid_dir=None):
+        self.model_dir = model_dir
+        self.engine_dir = os.path.join(model_dir, "fused")
+        self.grid_dir = grid_dir
+
+        self.engine = None
+        self.grid = None
+        self.version = None
+        self.source = None
+        self.state = "idle"
+        self.error = None
+        self.load_seconds = None
+
+        self._lock = threading.Lock()
+
+    def _has_joblib(self):
+        return all(os.path.exists(os.path.join(self.model_dir, name)) for name in MODEL_FILES)
+
+    def _compile(self, version):
+        import joblib
+
+        models = [joblib.load(os.path.join(self.model_dir, name)) for name in MODEL_FILES]
+        engine = FusedForest.from_models(models)
+
+        # Write to a private directory first so a concurrently starting
+        # worker never maps a half-written engine.
+        tmp_dir = f"{self.engine_dir}.tmp-{os.getpid()}"
+        try:
+            engine.save(tmp_dir, model_version=version)
+            replace_dir(tmp_dir, self.engine_dir)
+            return FusedForest.load(self.engine_dir)
+        except OSError as e:
+            print("⚠️ Could not write compiled engine, keeping it in memory:", e)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return engine
+
+    def _load_engine(self):
+        version = model_version(self.model_dir) if self._has_joblib() else None
+
+        if os.path.exists(os.path.join(self.engine_dir, "manifest.json")):
+            manifest = FusedForest.read_manifest(self.engine_dir)
+            if version is None or manifest.get("model_version") == version:
+                return FusedForest.load(self.engine_dir), manifest.get("model_version"), "fused"
+            print("⚠️ Compiled engine is stale, recompiling from joblib models")
+
+        if version is None:
+            raise FileNotFoundError(f"No models found in {self.model_dir}")
+
+        return self._compile(version), version, "joblib"
+
+    def load(self):
+        """Load the engine (and grid) once; safe to call from many threads"""
+        with self._lock:
+            if self.state == "ready":
+                return self.engine
+
+            self.state = "loading"
+            t0 = time.perf_counter()
+            try:
+                self.engine, self.version, self.source = self._load_engine()
+
+                unknown = [f for f in self.engine.feature_names if f not in BANDS]
+                if unknown:
+                    self.engine = None
+                    raise ValueError(
+                        f"Models expect features {unknown} that get_satellite_data "
+                        "does not produce; retrain with train_models.py"
+                    )
+
+                if self.grid_dir:
+                    self.grid = load_grid(self.grid_dir, self.version)
+            except Exception as e:
+                self.state = "failed"
+                self.error = str(e)
+                print("❌ Model loading failed:", e)
+                raise ModelsNotReady(f"Models not ready: {e}") from e
+
+            self.load_seconds = time.perf_counter() - t0
+            self.state = "ready"
+            self.error = None
+            print(f"✅ Models loaded from {self.source} in {self.load_seconds * 1e3:.0f} ms")
+            return self.engine
+
+    def get(self):
+        if self.state == "ready":
+            return self.engine
+        return self.load()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "source": self.source,
+            "model_version": self.version,
+            "load_ms": None if self.load_seconds is None else round(self.load_seconds * 1e3, 1),
+            "grid_cells": len(self.grid.names) if self.grid else 0,
+            "error": self.error,
+        }
@@ -0,0 +1,208 @@
+import base64
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ee_processor import BANDS, ee_client, fetch_pixel_block
+from metrics import current_timings, run_with_timings, stage
+from serving import EE_DEADLINE_S, DeadlineExceeded
+
+# -------------------------------
+# 🗺 Per-pixel Nutrient Maps
+# -------------------------------
+#
+# A field polygon is covered by an EPSG:4326 pixel grid at the requested
+# scale and fetched in MAP_BLOCK_PX square blocks (a few at a time through
+# the EE executor). Each block is scored as soon as it arrives, in
+# PREDICT_BATCH-row slices, and written into a float16 N/P/K raster, so peak
+# memory is the raster plus a handful of blocks whatever the field size.
+
+MAP_DEFAULT_SCALE = float(os.environ.get("MAP_DEFAULT_SCALE", 20))
+MAP_MIN_SCALE = 10
+# Scoring runs at roughly 80 µs per pixel on a request thread (and holds the
+# GIL), so the default keeps a full map well inside EE_DEADLINE_S.
+MAX_MAP_PIXELS = int(os.environ.get("MAX_MAP_PIXELS", 200_000))
+MAP_BLOCK_PX = int(os.environ.get("MAP_BLOCK_PX", 256))
+MAP_FETCH_CONCURRENCY = int(os.environ.get("MAP_FETCH_CONCURRENCY", 4))
+PREDICT_BATCH = int(os.environ.get("PREDICT_BATCH", 8192))
+
+METERS_PER_DEGREE = 111320.0
+NUTRIENTS = ["Nitrogen", "Phosphorus", "Potassium"]
+
+
+def parse_geometry(obj):
+    """GeoJSON Polygon / MultiPolygon (bare or wrapped in a Feature)"""
+    if obj.get("type") == "Feature":
+        obj = obj["geometry"]
+    if obj.get("type") not in ("Polygon", "MultiPolygon"):
+        raise ValueError("geometry must be a GeoJSON Polygon or MultiPolygon")
+    return {"type": obj["type"], "coordinates": obj["coordinates"]}
+
+
+def geometry_bounds(geometry):
+    polygons = geometry["coordinates"]
+    if geometry["type"] == "Polygon":
+        polygons = [polygons]
+
+    lons, lats = [], []
+    for polygon in polygons:
+        for ring in polygon:
+            for lon, lat, *_ in ring:
+                lons.append(float(lon))
+                lats.append(float(lat))
+
+    if not lons:
+        raise ValueError("geometry has no coordinates")
+
+    west, south, east, north = min(lons), min(lats), max(lons), max(lats)
+    if not (-90 <= south and north <= 90 and -180 <= west and east <= 180):
+        raise ValueError("Invalid latitude / longitude")
+    return west, south, east, north
+
+
+def plan_grid(bounds, scale):
+    west, south, east, north = bounds
+    step = scale / METERS_PER_DEGREE
+    width = max(1, math.ceil((east - west) / step))
+    height = max(1, math.ceil((north - south) / step))
+
+    if width * height > MAX_MAP_PIXELS:
+        raise ValueError(
+            f"Field is {width}x{height} pixels at {scale:g} m, above the "
+            f"{MAX_MAP_PIXELS} pixel limit; use a coarser scale"
+        )
+    return step, width, height
+
+
+def iter_blocks(width, height, size):
+    for row in range(0, height, size):
+        for col in range(0, width, size):
+            yield row, col, min(size, height - row), min(size, width - col)
+
+
+def summarize(raster, count, total, total_sq, lo, hi):
+    mean = total / count
+    std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0))
+
+    flat = raster.reshape(-1, 3)
+    values = flat[~np.isnan(flat[:, 0])].astype(np.float32)
+    p10, p50, p90 = np.percentile(values, [10, 50, 90], axis=0)
+
+    return {
+        name: {
+            "mean": float(mean[j]), "std": float(std[j]),
+            "min": float(lo[j]), "max": float(hi[j]),
+            "p10": float(p10[j]), "p50": float(p50[j]), "p90": float(p90[j])
+        }
+        for j, name in enumerate(NUTRIENTS)
+    }
+
+
+def predict_map(engine, geometry, scale=MAP_DEFAULT_SCALE, timeout=EE_DEADLINE_S):
+    """Score every valid pixel of a field; returns (zone stats dict, float16 raster, grid info).
+
+    `timeout` bounds the whole map, EE fetches and scoring together; it is
+    checked before every block and raises DeadlineExceeded.
+    """
+    if scale < MAP_MIN_SCALE:
+        raise ValueError(f"scale must be at least {MAP_MIN_SCALE} m")
+
+    west, south, east, north = geometry_bounds(geometry)
+    step, width, height = plan_grid((west, south, east, north), scale)
+    feature_idx = [BANDS.index(name) for name in engine.feature_names]
+
+    raster = np.full((height, width, 3), np.nan, dtype=np.float16)
+    count, inside = 0, 0
+    total, total_sq = np.zeros(3), np.zeros(3)
+    lo, hi = np.full(3, np.inf), np.full(3, -np.inf)
+
+    # Blocks are fetched from helper threads; their stages belong to this request
+    timings = current_timings()
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        if deadline is None:
+            return None
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise DeadlineExceeded(f"Map did not finish within {timeout:g}s")
+        return left
+
+    def fetch(block):
+        row, col, h, w = block
+        return run_with_timings(
+            timings, ee_client.call,
+            fetch_pixel_block, geometry,
+            west + col * step, north - row * step, step, w, h,
+            call="computePixels", timeout=remaining()
+        )
+
+    def consume(block, pixels):
+        nonlocal count, inside
+        remaining()
+        row, col, h, w = block
+        valid = pixels[..., -2] > 0
+        inside += int((pixels[..., -1] > 0).sum())
+
+        X = pixels[valid][:, feature_idx]
+        X[~np.isfinite(X)] = 0
+        if not len(X):
+            return
+
+        preds = np.empty((len(X), 3))
+        with stage("predict"):
+            for i in range(0, len(X), PREDICT_BATCH):
+                preds[i:i + PREDICT_BATCH] = engine.predict(X[i:i + PREDICT_BATCH])
+
+        raster[row:row + h, col:col + w][valid] = preds
+        count += len(preds)
+        total[:] += preds.sum(axis=0)
+        total_sq[:] += (preds ** 2).sum(axis=0)
+        lo[:] = np.minimum(lo, preds.min(axis=0))
+        hi[:] = np.maximum(hi, preds.max(axis=0))
+
+    # Keep at most MAP_FETCH_CONCURRENCY blocks in memory at once
+    with stage("map_blocks"), ThreadPoolExecutor(MAP_FETCH_CONCURRENCY) as pool:
+        pending = deque()
+        try:
+            for block in iter_blocks(width, height, MAP_BLOCK_PX):
+                pending.append((block, pool.submit(fetch, block)))
+                if len(pending) >= MAP_FETCH_CONCURRENCY:
+                    b, future = pending.popleft()
+                    consume(b, future.result())
+            while pending:
+                b, future = pending.popleft()
+                consume(b, future.result())
+        except Exception:
+            for _, future in pending:
+                future.cancel()
+            raise
+
+    if not count:
+        raise ValueError("No cloud-free pixels inside the field")
+
+    grid = {
+        "crs": "EPSG:4326",
+        "transform": [step, 0, west, 0, -step, north],
+        "width": width,
+        "height": height,
+        "scale_m": scale,
+        "valid_pixels": count,
+        "field_pixels": inside,
+        "coverage": round(count / inside, 4) if inside else None,
+    }
+    return summarize(raster, count, total, total_sq, lo, hi), raster, grid
+
+
+def encode_raster(raster):
+    return {
+        "dtype": "<f2",
+        "shape": list(raster.shape),
+        "bands": NUTRIENTS,
+        "nodata": "NaN",
+        "data": base64.b64encode(raster.astype("<f2").tobytes()).decode("ascii"),
+    }
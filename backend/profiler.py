@@ -0,0 +1,80 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# -------------------------------
+# 🔬 Per-request Sampling Profiler
+# -------------------------------
+#
+# Enabled with PROFILING_ENABLED=1, then switched on for a single request by
+# sending the header "X-Profile: 1". A background thread samples the stacks
+# of the request thread and of the EE executor threads every
+# PROFILE_INTERVAL_MS. When the request finishes, the hottest stacks are
+# printed; with PROFILE_DIR set they are also written in collapsed format
+# (one "frame;frame;frame count" line per stack), which flamegraph.pl and
+# speedscope read.
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+
+
+def _stack(frame):
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class SamplingProfiler:
+    def __init__(self, thread_prefixes=("ee",), interval=PROFILE_INTERVAL_MS / 1e3):
+        self.target = threading.get_ident()
+        self.thread_prefixes = thread_prefixes
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _watched(self):
+        watched = {self.target: "request"}
+        for t in threading.enumerate():
+            if t.name.startswith(self.thread_prefixes):
+                watched[t.ident] = t.name
+        return watched
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, name in self._watched().items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[f"{name};{_stack(frame)}"] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def report(self, label, top=15):
+        total = sum(self.samples.values())
+        print(f"🔬 Profile {label}: {total} samples every {self.interval * 1e3:g} ms")
+        for stack, count in self.samples.most_common(top):
+            leaf = stack.rsplit(";", 1)[-1]
+            thread = stack.split(";", 1)[0]
+            print(f"   {count:5d}  {thread:<10} {leaf}")
+
+        if PROFILE_DIR:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{label}-{int(time.time() * 1e3)}.collapsed")
+            with open(path, "w") as f:
+                for stack, count in self.samples.items():
+                    f.write(f"{stack} {count}\n")
+            print(f"   written to {path}")
@@ -0,0 +1,257 @@
+"""
+Score large coordinate files without going through /predict.
+
+    python score_bulk.py fields.csv scored.csv
+    python score_bulk.py fields.jsonl scored.jsonl --chunk-size 250 --concurrency 4
+    python score_bulk.py fields.csv scored.csv --resume      # after a crash
+
+Input rows need lat and lon; an optional id and box_size are honoured and
+any id is copied to the output. CSV and JSONL are picked by file extension.
+
+Rows are read lazily and scored a chunk at a time: each chunk is one
+reduceRegions call, up to --concurrency chunks are fetched at once, and
+results are written in input order as soon as the oldest chunk finishes, so
+memory stays flat however large the file is. After every written chunk a
+checkpoint (<output>.ckpt) records how many input rows and output bytes are
+done; --resume truncates the output to that point and skips those rows.
+
+Points Earth Engine rejects get an "error" row. An outage (open circuit
+breaker, overload, timeouts or transient errors after all retries) stops
+the run instead, leaving the checkpoint so --resume retries those rows.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from ee_client import EE_BREAKER_COOLDOWN_S, CircuitOpen, UpstreamError, is_transient
+from ee_processor import get_satellite_data_batch, point_box
+from inference import feature_matrix
+from model_store import ModelStore
+from serving import Overloaded
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+
+OUTPUT_FIELDS = ["id", "lat", "lon", "Nitrogen", "Phosphorus", "Potassium", "error"]
+
+
+# -------------------------------
+# 📄 Input / Output
+# -------------------------------
+
+def is_jsonl(path):
+    return path.endswith((".jsonl", ".ndjson"))
+
+
+def read_records(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+class ResultWriter:
+    def __init__(self, path, resume_bytes=None):
+        self.path = path
+        self.jsonl = is_jsonl(path)
+
+        if resume_bytes is None:
+            self.f = open(path, "w", newline="", encoding="utf-8")
+            if not self.jsonl:
+                csv.writer(self.f).writerow(OUTPUT_FIELDS)
+        else:
+            self.f = open(path, "r+", newline="", encoding="utf-8")
+            self.f.truncate(resume_bytes)
+            self.f.seek(resume_bytes)
+
+        self.csv = None if self.jsonl else csv.DictWriter(self.f, OUTPUT_FIELDS)
+
+    def write(self, rows):
+        for row in rows:
+            if self.jsonl:
+                self.f.write(json.dumps(row) + "\n")
+            else:
+                self.csv.writerow(row)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+
+def save_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+# -------------------------------
+# 🛰 Scoring
+# -------------------------------
+
+class Interrupted(Exception):
+    """Earth Engine stayed unavailable; stop and leave the checkpoint for --resume"""
+
+
+def is_outage(e):
+    """Failures that say nothing about the points themselves"""
+    if isinstance(e, (CircuitOpen, Overloaded, TimeoutError)):
+        return True
+    return isinstance(e, UpstreamError) and e.__cause__ is not None and is_transient(e.__cause__)
+
+
+def fetch_with_retry(boxes, retries, timeout):
+    """get_satellite_data_batch with exponential backoff and full jitter"""
+    for attempt in range(retries + 1):
+        try:
+            return get_satellite_data_batch(boxes, timeout=timeout)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = random.uniform(0, min(60, 2 ** attempt))
+            if isinstance(e, CircuitOpen):
+                # Retrying before the breaker's cooldown only burns attempts
+                delay += EE_BREAKER_COOLDOWN_S
+            print(f"⚠️ EE call failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def score_chunk(records, engine, retries, timeout):
+    out = []
+    boxes, positions = [], []
+
+    for rec in records:
+        row = {"id": rec.get("id"), "lat": rec.get("lat"), "lon": rec.get("lon")}
+        out.append(row)
+        try:
+            box_size = float(rec.get("box_size") or 0.1)
+            boxes.append(point_box(float(rec["lon"]), float(rec["lat"]), box_size))
+            positions.append(len(out) - 1)
+        except (KeyError, TypeError, ValueError) as e:
+            row["error"] = f"Invalid point: {e}"
+
+    if not boxes:
+        return out
+
+    try:
+        stats = fetch_with_retry(boxes, retries, timeout)
+    except Exception as e:
+        if is_outage(e):
+            raise Interrupted(str(e)) from e
+        for pos in positions:
+            out[pos]["error"] = f"Earth Engine failed after {retries + 1} attempts: {e}"
+        return out
+
+    scored = []
+    for pos, row in zip(positions, stats):
+        if row is None:
+            out[pos]["error"] = "No cloud-free imagery for this location"
+        else:
+            scored.append((pos, row))
+
+    if scored:
+        preds = engine.predict(feature_matrix([row for _, row in scored], engine.feature_names))
+        for (pos, _), (N, P, K) in zip(scored, preds):
+            out[pos].update({"Nitrogen": float(N), "Phosphorus": float(P), "Potassium": float(K)})
+
+    return out
+
+
+def chunks(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-score a CSV / JSONL file of coordinates")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--chunk-size", type=int, default=200, help="points per Earth Engine call")
+    parser.add_argument("--concurrency", type=int, default=4, help="chunks fetched at once")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per Earth Engine call")
+    parser.add_argument("--resume", action="store_true", help="continue from <output>.ckpt")
+    args = parser.parse_args()
+
+    ckpt_path = args.output + ".ckpt"
+    rows_done, resume_bytes = 0, None
+
+    if args.resume:
+        if not os.path.exists(ckpt_path):
+            sys.exit(f"❌ No checkpoint at {ckpt_path}")
+        with open(ckpt_path) as f:
+            ckpt = json.load(f)
+        if ckpt["input"] != os.path.abspath(args.input):
+            sys.exit(f"❌ Checkpoint belongs to {ckpt['input']}")
+        rows_done, resume_bytes = ckpt["rows_done"], ckpt["output_bytes"]
+        print(f"↩️  Resuming after {rows_done} rows")
+
+    engine = ModelStore(MODEL_DIR).get()
+    writer = ResultWriter(args.output, resume_bytes)
+
+    records = islice(read_records(args.input), rows_done, None)
+    pending = deque()
+    started = time.time()
+    scored_now = 0
+
+    def drain_one():
+        nonlocal rows_done, scored_now
+        rows = pending.popleft().result()
+        offset = writer.write(rows)
+        rows_done += len(rows)
+        scored_now += len(rows)
+        save_checkpoint(ckpt_path, {
+            "input": os.path.abspath(args.input),
+            "rows_done": rows_done,
+            "output_bytes": offset,
+        })
+        elapsed = time.time() - started
+        print(f"🛰 {rows_done} rows done, {scored_now / elapsed:.1f} points/s")
+
+    if resume_bytes is None:
+        save_checkpoint(ckpt_path, {
+            "input": os.path.abspath(args.input),
+            "rows_done": 0,
+            "output_bytes": writer.write([]),
+        })
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        try:
+            for chunk in chunks(records, args.chunk_size):
+                pending.append(pool.submit(score_chunk, chunk, engine, args.retries, args.timeout))
+                if len(pending) >= args.concurrency * 2:
+                    drain_one()
+            while pending:
+                drain_one()
+        except Interrupted as e:
+            # Rows after the checkpoint were not written; --resume scores them again
+            for future in pending:
+                future.cancel()
+            writer.close()
+            sys.exit(f"❌ Earth Engine unavailable ({e}); stopped after {rows_done} rows. "
+                     f"Re-run with --resume to continue.")
+
+    writer.close()
+    os.remove(ckpt_path)
+    print(f"🎉 Scored {rows_done} rows into {args.output} "
+          f"({scored_now / max(time.time() - started, 1e-9):.1f} points/s)")
+
+
+if __name__ == "__main__":
+    main()
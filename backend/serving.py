@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------
+# 🚦 Bounded Earth Engine Executor
+# -------------------------------
+#
+# Blocking getInfo() calls run on a small per-process thread pool instead of
+# directly on the request thread. The pool admits at most
+# max_workers + max_queue calls; anything beyond that is rejected right away
+# (Overloaded -> 503) rather than piling up behind slow EE requests.
+# ee_client.EEClient submits calls here and waits on their futures with a
+# deadline (DeadlineExceeded -> 504); an abandoned call keeps its slot until
+# EE returns, so the bound always holds.
+
+EE_MAX_CONCURRENCY = int(os.environ.get("EE_MAX_CONCURRENCY", 8))
+EE_MAX_QUEUE = int(os.environ.get("EE_MAX_QUEUE", 16))
+EE_DEADLINE_S = float(os.environ.get("EE_DEADLINE_S", 25))
+RETRY_AFTER_S = int(os.environ.get("RETRY_AFTER_S", 5))
+
+
+class Overloaded(Exception):
+    """Raised when the executor queue is full"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call does not finish within its deadline"""
+
+
+class BoundedExecutor:
+    def __init__(self, max_workers, max_queue, name="ee"):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.name = name
+
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+        self._in_flight = 0
+
+        self.counters = {"submitted": 0, "rejected": 0}
+
+    def _executor(self):
+        # Threads do not survive a fork, so each gunicorn worker builds its own pool.
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=self.name
+                )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def submit(self, fn, *args):
+        """Start fn(*args) on the pool and return its future without waiting"""
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise Overloaded("Server busy, please retry shortly")
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._done(None)
+            raise
+
+        future.add_done_callback(self._done)
+        self._count("submitted")
+        return future
+
+    def _done(self, _):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = self._in_flight
+        stats["capacity"] = self.capacity
+        stats["max_workers"] = self.max_workers
+        return stats
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+import ee_processor
+from ee_processor import BANDS
+from metrics import ee_errors, stage
+
+# -------------------------------
+# 🧪 Simulated Earth Engine
+# -------------------------------
+#
+# install() swaps ee_processor's Earth Engine calls for these local
+# stand-ins, so the API can be load-tested without credentials or quota
+# (benchmarks/simulated_app.py is the gunicorn entry point). They sleep for the configured latency (blocking,
+# like getInfo) and return band values derived from the box, so repeated
+# boxes give repeated answers.
+#
+#   SIM_LATENCY_MS     median call latency (lognormal)      default 800
+#   SIM_LATENCY_SIGMA  lognormal sigma, 0 for a fixed delay default 0.5
+#   SIM_FAILURE_RATE   fraction of calls raising an error   default 0
+#   SIM_HANG_RATE      fraction of calls taking SIM_HANG_S  default 0
+#   SIM_HANG_S         duration of a hung call              default 120
+#   SIM_PER_BOX_MS     extra latency per box in a batch     default 2
+
+SIM_LATENCY_MS = float(os.environ.get("SIM_LATENCY_MS", 800))
+SIM_LATENCY_SIGMA = float(os.environ.get("SIM_LATENCY_SIGMA", 0.5))
+SIM_FAILURE_RATE = float(os.environ.get("SIM_FAILURE_RATE", 0))
+SIM_HANG_RATE = float(os.environ.get("SIM_HANG_RATE", 0))
+SIM_HANG_S = float(os.environ.get("SIM_HANG_S", 120))
+SIM_PER_BOX_MS = float(os.environ.get("SIM_PER_BOX_MS", 2))
+
+# Messages mirror the errors Earth Engine actually returns
+SIM_ERRORS = [
+    "Too many concurrent aggregations.",
+    "Computation timed out.",
+    "An internal error has occurred.",
+]
+
+# Plausible range of each of BANDS; also used by the benchmarks and tests
+BAND_LOW = [100, 100, 100, 100, 100, 100, 0, -1, 0, -1]
+BAND_HIGH = [2000, 2000, 2000, 3000, 3000, 3000, 1, 1, 1, 1]
+
+_rng = np.random.default_rng()
+
+
+class SimulatedEEError(Exception):
+    """Stand-in for ee.EEException"""
+
+
+def simulate_call(call, n_boxes=1):
+    with stage("ee_getinfo"):
+        if SIM_HANG_RATE and _rng.random() < SIM_HANG_RATE:
+            time.sleep(SIM_HANG_S)
+        else:
+            latency = SIM_LATENCY_MS * np.exp(SIM_LATENCY_SIGMA * _rng.standard_normal())
+            time.sleep((latency + SIM_PER_BOX_MS * (n_boxes - 1)) / 1e3)
+
+    if SIM_FAILURE_RATE and _rng.random() < SIM_FAILURE_RATE:
+        error = SimulatedEEError(SIM_ERRORS[_rng.integers(len(SIM_ERRORS))])
+        ee_errors.inc(call, type(error).__name__)
+        raise error
+
+
+def box_rng(box, *extra):
+    seed = int.from_bytes(hashlib.blake2b(repr(tuple(round(v, 6) for v in box) + extra).encode(),
+                                          digest_size=8).digest(), "little")
+    return np.random.default_rng(seed)
+
+
+def random_rows(rng, n, names=BANDS):
+    """n band-stat dicts drawn uniformly from the band ranges"""
+    ranges = dict(zip(BANDS, zip(BAND_LOW, BAND_HIGH)))
+    low, high = zip(*(ranges[name] for name in names))
+    return [dict(zip(names, map(float, row))) for row in rng.uniform(low, high, (n, len(names)))]
+
+
+def box_stats(box):
+    values = box_rng(box).uniform(BAND_LOW, BAND_HIGH)
+    return {b: float(v) for b, v in zip(BANDS, values)}
+
+
+def fetch_box_stats(box):
+    simulate_call("reduceRegion")
+    return box_stats(box)
+
+
+def reduce_boxes(boxes, indices):
+    simulate_call("reduceRegions", len(indices))
+    return {"features": [
+        {"properties": dict(box_stats(boxes[i]), idx=i)} for i in indices
+    ]}
+
+
+def reduce_periods(box, periods):
+    simulate_call("reduceRegion", len(periods))
+    out = {}
+    for i, (label, _, _) in enumerate(periods):
+        rng = box_rng(box, label)
+        # About one period in ten has no cloud-free pixel at all
+        count = 0 if rng.random() < 0.1 else int(rng.integers(1, 3000))
+        values = rng.uniform(BAND_LOW, BAND_HIGH)
+        for b, v in zip(BANDS, values):
+            out[f"p{i}_{b}_mean"] = float(v) if count else None
+            out[f"p{i}_{b}_count"] = count
+    return out
+
+
+def fetch_pixel_block(geometry, west, north, step, width, height):
+    simulate_call("computePixels")
+    seed = int(abs(west * 1e6) + abs(north * 1e6)) % (2 ** 32)
+    pixels = np.random.default_rng(seed).uniform(
+        BAND_LOW + [0, 1], BAND_HIGH + [1, 1], (height, width, len(BANDS) + 2)
+    ).astype(np.float32)
+    pixels[..., -2] = pixels[..., -2] > 0.2
+    return pixels
+
+
+def install():
+    """Route ee_processor's Earth Engine calls here; call before importing app"""
+    ee_processor.fetch_box_stats = fetch_box_stats
+    ee_processor.reduce_boxes = reduce_boxes
+    ee_processor.reduce_periods = reduce_periods
+    ee_processor.fetch_pixel_block = fetch_pixel_block
+    ee_processor.FEATURE_BACKEND = "simulated"
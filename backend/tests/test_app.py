@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+import app as app_module
+from ee_processor import BANDS
+from inference import FusedForest
+from model_store import ModelStore
+
+
+def save_engine(model_dir):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.uniform(0, 1, (50, len(BANDS))), columns=BANDS)
+    models = [
+        RandomForestRegressor(n_estimators=3, max_depth=3, random_state=i).fit(X, rng.uniform(0, 100, 50))
+        for i in range(3)
+    ]
+    FusedForest.from_models(models).save(str(model_dir / "fused"), model_version="test")
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    store = ModelStore(str(tmp_path))
+    monkeypatch.setattr(app_module, "model_store", store)
+    return app_module.app.test_client(), store, tmp_path
+
+
+def test_ready_loads_lazily(api):
+    client, store, model_dir = api
+    save_engine(model_dir)
+    assert store.state == "idle"
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["state"] == "ready"
+    assert response.get_json()["feature_backend"] == "ee"
+    assert "X-Feature-Backend" not in response.headers
+    assert store.source == "fused"
+
+
+def test_ready_retries_a_failed_load(api):
+    client, store, model_dir = api
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["state"] == "failed"
+
+    save_engine(model_dir)
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.get_json()["state"] == "ready"
+
+
+def test_batch_rejects_malformed_entries_one_by_one(api, monkeypatch):
+    client, _, model_dir = api
+    save_engine(model_dir)
+    monkeypatch.setattr(app_module, "get_satellite_data_batch",
+                        lambda boxes: [{b: 0.5 for b in BANDS} for _ in boxes])
+
+    response = client.post("/predict/batch", json={"points": [
+        {"lat": 27.1, "lon": 78.0}, [27.1, 78.0], "x", {"bbox": [-180, -90, 180, 90]},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert "Nitrogen_avg" in results[0]
+    assert results[1] == {"error": "Invalid point: expected an object"}
+    assert results[2] == {"error": "Invalid point: expected an object"}
+    assert "at most" in results[3]["error"]
+
+
+def test_nearest_rejects_bad_radius(api):
+    client, _, model_dir = api
+    save_engine(model_dir)
+    for max_km in (-1, "nan", "inf"):
+        response = client.post("/predict/nearest", json={"lat": 27.1, "lon": 78.0, "max_km": max_km})
+        assert response.status_code == 400
+        assert "max_km" in response.get_json()["error"]
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+import ee_client
+from ee_client import CircuitBreaker, CircuitOpen, EEClient, UpstreamError
+from serving import BoundedExecutor, DeadlineExceeded
+
+
+@pytest.fixture
+def release():
+    """Event that unblocks stub calls left hanging on pool threads"""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ee_client, "EE_RETRY_BASE_S", 0.01)
+    monkeypatch.setattr(ee_client, "EE_HEDGE", False)
+    return EEClient(BoundedExecutor(4, 4, name="test-ee"))
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(window=4, min_calls=2, threshold=0.5, cooldown=0.05)
+
+    breaker.record(False)
+    assert breaker.state == "closed"
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # one probe at a time
+
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(window=4, min_calls=1, threshold=0.5, cooldown=0.05)
+    breaker.record(False)
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.trips == 2
+    assert not breaker.allow()
+
+
+def test_open_breaker_short_circuits(client):
+    client.breaker = CircuitBreaker(window=4, min_calls=1, threshold=0.5, cooldown=60)
+    client.breaker.record(False)
+
+    with pytest.raises(CircuitOpen):
+        client.call(lambda: "never", call="test")
+    assert client.stats()["short_circuited"] == 1
+
+
+def test_hedge_wins_over_slow_primary(monkeypatch, release):
+    monkeypatch.setattr(ee_client, "EE_HEDGE", True)
+    monkeypatch.setattr(ee_client, "EE_HEDGE_MIN_S", 0.05)
+    client = EEClient(BoundedExecutor(4, 4, name="test-ee"))
+    for _ in range(ee_client.EE_HEDGE_MIN_SAMPLES):
+        client.latency.observe("test", 0.01)
+
+    calls = []
+
+    def fetch():
+        calls.append(None)
+        if len(calls) == 1:
+            release.wait(5)
+            return "primary"
+        return "hedge"
+
+    t0 = time.monotonic()
+    assert client.call(fetch, call="test", timeout=5) == "hedge"
+    assert time.monotonic() - t0 < 1
+    assert client.stats()["hedges"] == 1
+    assert client.stats()["hedge_wins"] == 1
+
+
+def test_transient_error_is_retried(client):
+    attempts = []
+
+    def fetch():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise Exception("Too many concurrent aggregations.")
+        return "ok"
+
+    assert client.call(fetch, call="test", timeout=5) == "ok"
+    assert len(attempts) == 2
+    assert client.stats()["retries"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_attempt_timeout_is_retried_within_deadline(client, monkeypatch, release):
+    monkeypatch.setattr(ee_client, "EE_CALL_TIMEOUT_S", 0.1)
+    attempts = []
+
+    def fetch():
+        attempts.append(None)
+        if len(attempts) == 1:
+            release.wait(5)
+        return len(attempts)
+
+    # Each attempt gets max(EE_CALL_TIMEOUT_S, 0.9 / 3) = 0.3 s of the 0.9 s deadline
+    t0 = time.monotonic()
+    assert client.call(fetch, call="test", timeout=0.9) == 2
+    assert 0.25 < time.monotonic() - t0 < 0.8
+    assert client.stats()["retries"] == 1
+
+
+def test_deadline_bounds_all_attempts(client, release):
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        client.call(lambda: release.wait(5), call="test", timeout=0.2)
+    assert time.monotonic() - t0 < 0.5
+
+
+def test_failed_call_counts_once_towards_breaker(client):
+    def fetch():
+        raise Exception("An internal error has occurred.")
+
+    with pytest.raises(UpstreamError):
+        client.call(fetch, call="test", timeout=5)
+
+    assert client.stats()["retries"] == ee_client.EE_RETRIES
+    assert list(client.breaker._outcomes) == [False]
+
+
+def test_request_error_is_not_retried_or_counted(client):
+    attempts = []
+
+    def fetch():
+        attempts.append(None)
+        raise Exception("Geometry.coordinates: Invalid geometry.")
+
+    with pytest.raises(UpstreamError):
+        client.call(fetch, call="test", timeout=5)
+
+    assert len(attempts) == 1
+    assert list(client.breaker._outcomes) == []
+
+
+def test_request_error_from_probe_closes_breaker(client):
+    client.breaker = CircuitBreaker(window=4, min_calls=1, threshold=0.5, cooldown=0.05)
+    client.breaker.record(False)
+    time.sleep(0.06)
+
+    def fetch():
+        raise Exception("Geometry.coordinates: Invalid geometry.")
+
+    with pytest.raises(UpstreamError):
+        client.call(fetch, call="test", timeout=5)
+
+    assert client.breaker.state == "closed"
+    assert client.call(lambda: "ok", call="test", timeout=5) == "ok"
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from feature_cache import FeatureCache
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def start_followers(cache, key, n, results):
+    def follower():
+        try:
+            results.append(cache.get_or_compute(key, lambda: "follower computed", timeout=5))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=follower) for _ in range(n)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: cache.stats()["coalesced"] == n)
+    return threads
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = FeatureCache()
+    release, started = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(None)
+        started.set()
+        release.wait(5)
+        return {"B2": 1.0}
+
+    leader = threading.Thread(target=cache.get_or_compute, args=("k", compute))
+    leader.start()
+    started.wait(5)
+
+    results = []
+    followers = start_followers(cache, "k", 3, results)
+    release.set()
+    for t in [leader] + followers:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"B2": 1.0}] * 3
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 3, 0)
+    assert cache.get("k") == {"B2": 1.0}
+
+
+def test_leader_error_reaches_coalesced_waiters():
+    cache = FeatureCache()
+    release, started = threading.Event(), threading.Event()
+    error = RuntimeError("Earth Engine failed")
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise error
+
+    leader_result = []
+
+    def leader():
+        try:
+            cache.get_or_compute("k", compute)
+        except Exception as e:
+            leader_result.append(e)
+
+    t = threading.Thread(target=leader)
+    t.start()
+    started.wait(5)
+
+    results = []
+    followers = start_followers(cache, "k", 3, results)
+    release.set()
+    for thread in [t] + followers:
+        thread.join(5)
+
+    assert leader_result == [error]
+    assert results == [error] * 3
+    assert cache.stats()["errors"] == 1
+    # Failures are not cached: the next caller computes again
+    assert cache.get_or_compute("k", lambda: "fresh") == "fresh"
+
+
+def test_waiter_gives_up_after_timeout():
+    cache = FeatureCache()
+    release, started = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return "late"
+
+    t = threading.Thread(target=cache.get_or_compute, args=("k", compute))
+    t.start()
+    started.wait(5)
+
+    with pytest.raises(TimeoutError):
+        cache.get_or_compute("k", lambda: "unused", timeout=0.05)
+    release.set()
+    t.join(5)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from ee_processor import BANDS, stats_to_frame
+from inference import FusedForest, feature_matrix, float32_floor
+from simulated_ee import random_rows
+
+
+@pytest.fixture(scope="module")
+def models():
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame(random_rows(rng, 300))
+    targets = [
+        50 + 10 * X["NDVI"] + rng.normal(0, 2, len(X)),
+        30 + 5 * X["SAVI"] + rng.normal(0, 1, len(X)),
+        100 + 8 * X["BSI"] + rng.normal(0, 3, len(X)),
+    ]
+    return [RandomForestRegressor(n_estimators=10, random_state=i).fit(X, y)
+            for i, y in enumerate(targets)]
+
+
+def sklearn_predict(models, rows):
+    df = stats_to_frame(rows)
+    return np.column_stack([m.predict(df) for m in models])
+
+
+def fused_predict(engine, rows):
+    return engine.predict(feature_matrix(rows, engine.feature_names))
+
+
+def threshold_rows(models, rng):
+    """Rows with one feature exactly on a split threshold, or one float32 step either side"""
+    rows = []
+    for model in models:
+        for est in model.estimators_[:3]:
+            tree = est.tree_
+            for node in np.flatnonzero(tree.children_left != -1)[:10]:
+                name = BANDS[tree.feature[node]]
+                on = np.float32(tree.threshold[node])
+                for value in (on, np.nextafter(on, np.float32(np.inf)), np.nextafter(on, np.float32(-np.inf))):
+                    row = random_rows(rng, 1)[0]
+                    row[name] = float(value)
+                    rows.append(row)
+    return rows
+
+
+def test_matches_sklearn(models):
+    engine = FusedForest.from_models(models)
+    rows = random_rows(np.random.default_rng(0), 200)
+    assert np.array_equal(fused_predict(engine, rows), sklearn_predict(models, rows))
+
+
+def test_matches_sklearn_on_thresholds(models):
+    engine = FusedForest.from_models(models)
+    rows = threshold_rows(models, np.random.default_rng(1))
+    assert np.array_equal(fused_predict(engine, rows), sklearn_predict(models, rows))
+
+
+def test_matches_sklearn_on_missing_values(models):
+    engine = FusedForest.from_models(models)
+    rows = random_rows(np.random.default_rng(2), 4)
+    rows[0]["NDVI"] = None
+    rows[1]["B8"] = float("nan")
+    rows[2]["SAVI"] = float("inf")
+    rows[3]["BSI"] = float("-inf")
+    assert np.array_equal(fused_predict(engine, rows), sklearn_predict(models, rows))
+
+
+def test_float32_floor():
+    values = np.array([0.1, -0.1, 1 / 3, 1.0, -2.5, 1e30, np.float32(0.7)], dtype=np.float64)
+    floor = float32_floor(values)
+    assert floor.dtype == np.float32
+    assert np.all(floor.astype(np.float64) <= values)
+    assert np.all(np.nextafter(floor, np.float32(np.inf)).astype(np.float64) > values)
+    # Values already representable in float32 are kept as they are
+    assert floor[3] == 1.0 and floor[4] == -2.5 and floor[6] == np.float32(0.7)
+
+
+def test_save_load_round_trip(models, tmp_path):
+    engine = FusedForest.from_models(models)
+    engine.save(str(tmp_path / "fused"), model_version="abc")
+
+    loaded = FusedForest.load(str(tmp_path / "fused"))
+    assert FusedForest.read_manifest(str(tmp_path / "fused"))["model_version"] == "abc"
+    assert loaded.feature_names == engine.feature_names
+    assert loaded.n_trees == engine.n_trees
+    assert isinstance(loaded.threshold, np.memmap)
+
+    rows = random_rows(np.random.default_rng(3), 50)
+    assert np.array_equal(fused_predict(loaded, rows), fused_predict(engine, rows))
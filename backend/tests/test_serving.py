@@ -0,0 +1,43 @@
+import threading
+import time
+
+import pytest
+
+from serving import BoundedExecutor, Overloaded
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_in_flight_counts_running_and_queued_calls():
+    pool = BoundedExecutor(1, 1, name="test-pool")
+    release = threading.Event()
+    futures = [pool.submit(release.wait, 5) for _ in range(2)]
+    assert pool.stats()["in_flight"] == 2
+
+    with pytest.raises(Overloaded):
+        pool.submit(release.wait, 5)
+    assert pool.stats()["rejected"] == 1
+
+    release.set()
+    for future in futures:
+        future.result(5)
+    wait_until(lambda: pool.stats()["in_flight"] == 0)
+    pool.submit(lambda: None).result(5)
+    wait_until(lambda: pool.stats()["in_flight"] == 0)
+
+
+def test_failed_call_frees_its_slot():
+    pool = BoundedExecutor(1, 0, name="test-pool")
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        pool.submit(fail).result(5)
+    wait_until(lambda: pool.stats()["in_flight"] == 0)
+    assert pool.submit(lambda: "ok").result(5) == "ok"
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+
+import pytest
+
+import timeseries
+from timeseries import MAX_PERIODS, SETTLE_DAYS, period_ranges, predict_timeseries
+
+
+def test_seasonal_december_starts_djf():
+    assert period_ranges(date(2022, 12, 5), date(2023, 3, 1), "seasonal") == [
+        ("2022-DJF", "2022-12-05", "2023-03-01"),
+        ("2023-MAM", "2023-03-01", "2023-03-02"),
+    ]
+
+
+def test_seasonal_january_belongs_to_previous_djf():
+    assert period_ranges(date(2023, 1, 10), date(2023, 2, 28), "seasonal") == [
+        ("2022-DJF", "2023-01-10", "2023-03-01"),
+    ]
+
+
+def test_monthly_across_year_boundary():
+    assert period_ranges(date(2022, 11, 15), date(2023, 2, 10), "monthly") == [
+        ("2022-11", "2022-11-15", "2022-12-01"),
+        ("2022-12", "2022-12-01", "2023-01-01"),
+        ("2023-01", "2023-01-01", "2023-02-01"),
+        ("2023-02", "2023-02-01", "2023-02-11"),
+    ]
+
+
+def test_unknown_period():
+    with pytest.raises(ValueError):
+        period_ranges(date(2022, 1, 1), date(2022, 2, 1), "weekly")
+
+
+@pytest.fixture
+def period_stats(monkeypatch):
+    calls = []
+
+    def get_period_stats(lon, lat, periods, box_size, timeout, cache):
+        calls.append(cache)
+        return [(None, 0)] * len(periods)
+
+    monkeypatch.setattr(timeseries, "get_period_stats", get_period_stats)
+    return calls
+
+
+def test_too_many_periods(period_stats):
+    start = date(2019, 1, 1)
+    end = timeseries.add_months(start, MAX_PERIODS) - timedelta(days=1)
+    series = predict_timeseries(None, 78.0, 27.1, start.isoformat(), end.isoformat(), "monthly")
+    assert len(series["periods"]) == MAX_PERIODS
+
+    end += timedelta(days=1)
+    with pytest.raises(ValueError, match="Too many periods"):
+        predict_timeseries(None, 78.0, 27.1, start.isoformat(), end.isoformat(), "monthly")
+    assert period_stats == [True]
+
+
+def test_only_settled_series_are_cached(period_stats):
+    today = date.today()
+    for days_ago in (3, SETTLE_DAYS + 30):
+        end = today - timedelta(days=days_ago)
+        series = predict_timeseries(None, 78.0, 27.1, (end - timedelta(days=60)).isoformat(),
+                                    end.isoformat(), "monthly")
+        assert set(series["quality"]) == {"no_data"}
+        assert series["Nitrogen"] == [None] * len(series["periods"])
+    assert period_stats == [False, True]
+
+
+def test_future_end_is_rejected(period_stats):
+    tomorrow = date.today() + timedelta(days=1)
+    with pytest.raises(ValueError, match="future"):
+        predict_timeseries(None, 78.0, 27.1, "2023-01-01", tomorrow.isoformat(), "monthly")
+    assert period_stats == []
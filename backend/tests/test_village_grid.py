@@ -0,0 +1,36 @@
+import numpy as np
+
+from village_grid import EARTH_RADIUS_KM, VillageGrid, chord_to_km, km_to_chord, save_grid
+
+
+def make_grid(tmp_path):
+    coords = [(27.1, 78.0), (27.2, 78.1)]
+    save_grid(str(tmp_path / "grid"), ["a", "b"], coords,
+              np.zeros((2, 10)), np.arange(6.0).reshape(2, 3), {"model_version": "test"})
+    return VillageGrid(str(tmp_path / "grid"))
+
+
+def test_km_to_chord_is_monotonic_and_clamped():
+    km = np.array([-5, 0, 1, 1000, 20000, 30000, 40000, 1e9])
+    chords = km_to_chord(km)
+    assert np.all(np.diff(chords) >= 0)
+    assert chords[0] == 0
+    assert chords[-1] == km_to_chord(np.pi * EARTH_RADIUS_KM) == 2
+    assert np.isclose(chord_to_km(km_to_chord(1000)), 1000)
+
+
+def test_nearest(tmp_path):
+    grid = make_grid(tmp_path)
+    i, distance_km = grid.nearest(27.11, 78.0, 5)
+    assert grid.names[i] == "a" and distance_km < 2
+    assert grid.nearest(0, 0, 5) is None
+
+
+def test_radius_beyond_half_the_globe_finds_every_cell(tmp_path):
+    grid = make_grid(tmp_path)
+    # Near the antipode of both cells, "b" being ~19980 km away
+    lat, lon = -26.9, -101.8
+    for max_km in (19990, 30000, 40000, 1e9):
+        i, distance_km = grid.nearest(lat, lon, max_km)
+        assert grid.names[i] == "b" and 19970 < distance_km < 19990
+    assert grid.nearest(lat, lon, 19970) is None
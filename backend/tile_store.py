@@ -0,0 +1,226 @@
+"""
+Local Sentinel-2 composite tile store.
+
+    python tile_store.py export up_west 77.0,26.0,80.0,28.5 [--scale 200]
+
+exports the spring composite (B2, B3, B4, B8, B11, B12, NDVI, NDMI, SAVI,
+BSI) for a region into TILE_STORE_DIR/<name>/ as fixed-size .npy tiles.
+Setting FEATURE_BACKEND=tiles makes get_band_stats answer box means from
+those tiles with NumPy, falling back to Earth Engine for boxes outside
+every exported region.
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TILE_STORE_DIR = os.environ.get("TILE_STORE_DIR", os.path.join(BASE_DIR, "tiles"))
+
+METERS_PER_DEGREE = 111320.0
+TILE_FORMAT = 1
+
+# -------------------------------
+# 🧱 Tile Store
+# -------------------------------
+#
+# Each region directory holds index.json (grid origin, pixel step, tile size,
+# band list, composite settings) and one r<row>_c<col>.npy per tile, shaped
+# (rows, cols, bands + 1) float32; the extra last channel is 1 where the
+# composite has a cloud-free value. Tiles are opened memory-mapped and a box
+# mean only slices the pixels it covers, so a lookup reads a few pages from
+# the page cache and copies nothing.
+#
+# Box means use pixels whose centres fall inside the box, at the export
+# scale. Exporting at the live SCALE (200 m) keeps them close to the
+# reduceRegion means the EE backend returns.
+
+
+class Region:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as f:
+            index = json.load(f)
+        if index.get("format") != TILE_FORMAT:
+            raise ValueError(f"Unsupported tile store format in {path}")
+
+        self.index = index
+        self.bands = index["bands"]
+        self.west, self.south, self.east, self.north = index["bounds"]
+        self.step = index["step"]
+        self.tile_px = index["tile_px"]
+        self.width = index["width"]
+        self.height = index["height"]
+
+        self._tiles = {}
+
+    def covers(self, box):
+        west, south, east, north = box
+        return (self.west <= west and east <= self.east
+                and self.south <= south and north <= self.north)
+
+    def tile_path(self, row, col):
+        return os.path.join(self.path, f"r{row}_c{col}.npy")
+
+    def tile(self, row, col):
+        tile = self._tiles.get((row, col))
+        if tile is None:
+            path = self.tile_path(row, col)
+            if not os.path.exists(path):
+                return None
+            tile = self._tiles[(row, col)] = np.load(path, mmap_mode="r")
+        return tile
+
+    def pixel_window(self, box):
+        """Inclusive pixel row/col range whose centres lie in the box"""
+        west, south, east, north = box
+        c0 = math.ceil((west - self.west) / self.step - 0.5)
+        c1 = math.floor((east - self.west) / self.step - 0.5)
+        r0 = math.ceil((self.north - north) / self.step - 0.5)
+        r1 = math.floor((self.north - south) / self.step - 0.5)
+
+        if c1 < c0 or r1 < r0:
+            # Box smaller than a pixel: use the pixel under its centre
+            c0 = c1 = int(((west + east) / 2 - self.west) / self.step)
+            r0 = r1 = int((self.north - (north + south) / 2) / self.step)
+
+        return (max(r0, 0), min(r1, self.height - 1),
+                max(c0, 0), min(c1, self.width - 1))
+
+    def box_stats(self, box):
+        """Band means over the box, or None if a needed tile is missing"""
+        r0, r1, c0, c1 = self.pixel_window(box)
+        tp = self.tile_px
+
+        sums = np.zeros(len(self.bands))
+        count = 0
+
+        for tr in range(r0 // tp, r1 // tp + 1):
+            for tc in range(c0 // tp, c1 // tp + 1):
+                tile = self.tile(tr, tc)
+                if tile is None:
+                    return None
+
+                rs, re = max(r0, tr * tp) - tr * tp, min(r1, tr * tp + tp - 1) - tr * tp + 1
+                cs, ce = max(c0, tc * tp) - tc * tp, min(c1, tc * tp + tp - 1) - tc * tp + 1
+
+                window = tile[rs:re, cs:ce]
+                valid = window[..., -1] > 0
+                sums += window[..., :-1][valid].sum(axis=0, dtype=np.float64)
+                count += int(valid.sum())
+
+        if not count:
+            return {b: None for b in self.bands}
+        return {b: float(v) for b, v in zip(self.bands, sums / count)}
+
+
+class TileStore:
+    def __init__(self, root):
+        self.root = root
+        self.regions = []
+
+        if os.path.isdir(root):
+            for name in sorted(os.listdir(root)):
+                if os.path.exists(os.path.join(root, name, "index.json")):
+                    self.regions.append(Region(os.path.join(root, name)))
+
+        print(f"✅ Tile store: {len(self.regions)} region(s) in {root}")
+
+    def box_stats(self, box):
+        """Band means for a [west, south, east, north] box, or None if not covered"""
+        for region in self.regions:
+            if region.covers(box):
+                return region.box_stats(box)
+        return None
+
+
+# -------------------------------
+# 📤 Export
+# -------------------------------
+
+def export_region(name, bounds, scale, tile_px, root=TILE_STORE_DIR):
+    from ee_processor import BANDS, END_DATE, START_DATE, fetch_pixel_block
+
+    west, south, east, north = bounds
+    step = scale / METERS_PER_DEGREE
+    width = math.ceil((east - west) / step)
+    height = math.ceil((north - south) / step)
+
+    index = {
+        "format": TILE_FORMAT,
+        "bands": BANDS,
+        "start_date": START_DATE,
+        "end_date": END_DATE,
+        "scale_m": scale,
+        "bounds": [west, south, west + width * step, north],
+        "step": step,
+        "tile_px": tile_px,
+        "width": width,
+        "height": height,
+    }
+
+    out_dir = os.path.join(root, name)
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, "index.json")
+
+    # Re-running an export resumes it; the grid itself must not change
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            existing = json.load(f)
+        if existing != index:
+            raise SystemExit(f"❌ {out_dir} was exported with different settings")
+    else:
+        with open(index_path, "w") as f:
+            json.dump(index, f, indent=2)
+
+    region = Region(out_dir)
+    geometry = {
+        "type": "Polygon",
+        "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]
+    }
+
+    rows, cols = math.ceil(height / tile_px), math.ceil(width / tile_px)
+    t0 = time.time()
+    for row in range(rows):
+        for col in range(cols):
+            path = region.tile_path(row, col)
+            if os.path.exists(path):
+                continue
+
+            h = min(tile_px, height - row * tile_px)
+            w = min(tile_px, width - col * tile_px)
+            pixels = fetch_pixel_block(
+                geometry, west + col * tile_px * step, north - row * tile_px * step, step, w, h
+            )
+            # Keep the bands plus the "valid" channel; "inside" is always 1 here
+            tile = np.ascontiguousarray(pixels[..., :-1], dtype=np.float32)
+
+            tmp = path + ".tmp.npy"
+            np.save(tmp, tile)
+            os.replace(tmp, path)
+            print(f"🧱 tile {row * cols + col + 1}/{rows * cols} ({time.time() - t0:.0f}s)")
+
+    print(f"🎉 Region {name}: {width}x{height} px at {scale:g} m in {rows * cols} tiles")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local composite tile store")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export a region from Earth Engine")
+    export.add_argument("name")
+    export.add_argument("bounds", help="west,south,east,north")
+    export.add_argument("--scale", type=float, default=200, help="metres per pixel")
+    export.add_argument("--tile-px", type=int, default=512)
+    export.add_argument("--dir", default=TILE_STORE_DIR)
+
+    args = parser.parse_args()
+    bounds = [float(v) for v in args.bounds.split(",")]
+    export_region(args.name, bounds, args.scale, args.tile_px, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import math
+import os
+from datetime import date, timedelta
+
+from ee_processor import SCALE, get_period_stats, point_box
+from inference import feature_matrix
+from metrics import stage
+from serving import EE_DEADLINE_S
+
+# -------------------------------
+# 📅 Multi-season Time Series
+# -------------------------------
+#
+# A date range is cut into monthly or seasonal periods (meteorological
+# seasons DJF / MAM / JJA / SON, labelled by the year they start in; the
+# default composite window, March to May, is MAM). Every period's composite
+# is reduced over the box in one Earth Engine call (reduce_periods), and
+# every period with data is scored in one engine.predict call.
+#
+# Each period reports its cloud-free pixel count and the share of the box it
+# covers at SCALE; "low" marks periods under TIMESERIES_MIN_COVERAGE, and
+# "no_data" periods carry null predictions. Series reaching the last
+# TIMESERIES_SETTLE_DAYS are recomputed on every request rather than cached.
+
+PERIODS = ("monthly", "seasonal")
+SEASONS = {3: "MAM", 6: "JJA", 9: "SON", 12: "DJF"}
+MAX_PERIODS = int(os.environ.get("TIMESERIES_MAX_PERIODS", 36))
+MIN_COVERAGE = float(os.environ.get("TIMESERIES_MIN_COVERAGE", 0.5))
+# Scenes keep arriving for a while after acquisition; only series ending at
+# least this many days ago go into the (never-expiring) feature cache.
+SETTLE_DAYS = int(os.environ.get("TIMESERIES_SETTLE_DAYS", 14))
+
+# Sentinel-2 surface reflectance starts in spring 2017
+FIRST_DATE = date(2017, 3, 28)
+METERS_PER_DEGREE = 111320.0
+NUTRIENTS = ["Nitrogen", "Phosphorus", "Potassium"]
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+def add_months(day, months):
+    m = day.month - 1 + months
+    return date(day.year + m // 12, m % 12 + 1, 1)
+
+
+def period_ranges(start, end, period):
+    """[(label, first day, day after the last day), ...] covering start..end inclusive"""
+    if period == "monthly":
+        step, first = 1, date(start.year, start.month, 1)
+    elif period == "seasonal":
+        step = 3
+        month = start.month - start.month % 3
+        first = date(start.year, month, 1) if month else date(start.year - 1, 12, 1)
+    else:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+
+    ranges = []
+    stop = end + timedelta(days=1)
+    current = first
+    while current < stop:
+        following = add_months(current, step)
+        if period == "monthly":
+            label = f"{current.year}-{current.month:02d}"
+        else:
+            label = f"{current.year}-{SEASONS[current.month]}"
+        ranges.append((label, max(current, start).isoformat(), min(following, stop).isoformat()))
+        current = following
+    return ranges
+
+
+def expected_pixels(box):
+    """Approximate number of SCALE-metre pixels in a [west, south, east, north] box"""
+    west, south, east, north = box
+    width = (east - west) * METERS_PER_DEGREE * math.cos(math.radians((south + north) / 2))
+    height = (north - south) * METERS_PER_DEGREE
+    return max(width / SCALE, 1) * max(height / SCALE, 1)
+
+
+def predict_timeseries(engine, lon, lat, start, end, period, box_size=0.1, timeout=EE_DEADLINE_S):
+    """N/P/K series for one point as a dict of parallel lists, one entry per period"""
+    start, end = parse_date(start), parse_date(end)
+    if end < start:
+        raise ValueError("end must not be before start")
+    if start < FIRST_DATE:
+        raise ValueError(f"start must be on or after {FIRST_DATE.isoformat()}")
+    today = date.today()
+    if end > today:
+        raise ValueError("end must not be in the future")
+
+    periods = period_ranges(start, end, period)
+    if len(periods) > MAX_PERIODS:
+        raise ValueError(f"Too many periods ({len(periods)}, max {MAX_PERIODS})")
+
+    settled = date.fromisoformat(periods[-1][2]) + timedelta(days=SETTLE_DAYS) <= today
+    stats = get_period_stats(lon, lat, periods, box_size, timeout=timeout, cache=settled)
+
+    series = {name: [None] * len(periods) for name in NUTRIENTS}
+    scored = [i for i, (row, _) in enumerate(stats) if row is not None]
+    if scored:
+        with stage("features"):
+            X = feature_matrix([stats[i][0] for i in scored], engine.feature_names)
+        with stage("predict"):
+            preds = engine.predict(X)
+        for i, pred in zip(scored, preds):
+            for name, value in zip(NUTRIENTS, pred):
+                series[name][i] = float(value)
+
+    expected = expected_pixels(point_box(lon, lat, box_size))
+    counts = [count for _, count in stats]
+    coverage = [round(min(count / expected, 1.0), 3) for count in counts]
+
+    return {
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "periods": [label for label, _, _ in periods],
+        **series,
+        "pixels": counts,
+        "coverage": coverage,
+        "quality": [
+            "no_data" if not count else "low" if cov < MIN_COVERAGE else "good"
+            for count, cov in zip(counts, coverage)
+        ],
+    }
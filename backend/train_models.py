@@ -1,53 +1,214 @@
-import pandas as pd
+"""
+Train the soil N/P/K models and export them for serving.
+
+    python train_models.py                                   # synthetic demo data
+    python train_models.py --data samples.csv more.parquet   # labelled samples
+    python train_models.py --data samples.csv --max-depth 16 --n-estimators 60
+
+Input files need the band columns emitted by get_satellite_data
+(B2, B3, B4, B8, B11, B12, NDVI, NDMI, SAVI, BSI) plus N, P and K targets.
+Older files using B2_Blue / B8_NIR / ... names are renamed on read.
+
+Writes the three joblib models and models/fused/, the compiled engine the
+API memory-maps at startup, with a manifest recording feature order.
+"""
+import argparse
+import os
+import time
+
+import joblib
 import numpy as np
-from sklearn.model_selection import train_test_split
+import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestRegressor
-import joblib
-import os
+from sklearn.model_selection import train_test_split
 
-# 🌾 Generate dummy satellite feature data
-np.random.seed(42)
-n_samples = 500
-
-data = pd.DataFrame({
-    'B2_Blue': np.random.uniform(100, 2000, n_samples),
-    'B3_Green': np.random.uniform(100, 2000, n_samples),
-    'B4_Red': np.random.uniform(100, 2000, n_samples),
-    'B8_NIR': np.random.uniform(100, 3000, n_samples),
-    'B11_SWIR1': np.random.uniform(100, 3000, n_samples),
-    'B12_SWIR2': np.random.uniform(100, 3000, n_samples),
-    'NDVI': np.random.uniform(0, 1, n_samples),
-    'NDMI': np.random.uniform(-1, 1, n_samples),
-    'SAVI': np.random.uniform(0, 1, n_samples),
-    'BSI': np.random.uniform(-1, 1, n_samples),
-})
-
-# 🌱 Generate dummy nutrient levels
-data['N'] = 50 + 10 * data['NDVI'] + np.random.normal(0, 2, n_samples)
-data['P'] = 30 + 5 * data['SAVI'] + np.random.normal(0, 1, n_samples)
-data['K'] = 100 + 8 * data['BSI'] + np.random.normal(0, 3, n_samples)
-
-X = data[['B2_Blue', 'B3_Green', 'B4_Red', 'B8_NIR', 'B11_SWIR1',
-           'B12_SWIR2', 'NDVI', 'NDMI', 'SAVI', 'BSI']]
-y_N, y_P, y_K = data['N'], data['P'], data['K']
-
-# 🎯 Train models
-models = {
-    'soil_nitrogen_model.joblib': RandomForestRegressor(n_estimators=100, random_state=42),
-    'soil_phosphorus_model.joblib': RandomForestRegressor(n_estimators=100, random_state=42),
-    'soil_potassium_model.joblib': RandomForestRegressor(n_estimators=100, random_state=42),
+from ee_processor import BANDS
+from inference import MODEL_FILES, FusedForest, model_version, replace_dir
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = ['N', 'P', 'K']
+
+# Column names used by earlier training data
+LEGACY_NAMES = {
+    'B2_Blue': 'B2', 'B3_Green': 'B3', 'B4_Red': 'B4', 'B8_NIR': 'B8',
+    'B11_SWIR1': 'B11', 'B12_SWIR2': 'B12',
 }
 
-# Train each model
-models['soil_nitrogen_model.joblib'].fit(X, y_N)
-models['soil_phosphorus_model.joblib'].fit(X, y_P)
-models['soil_potassium_model.joblib'].fit(X, y_K)
 
-# 💾 Save models in models/ folder
-os.makedirs("models", exist_ok=True)
+# -------------------------------
+# 📥 Training Data
+# -------------------------------
+
+def synthetic_samples(n_samples=500):
+    """🌾 Dummy satellite features with dummy nutrient levels"""
+    np.random.seed(42)
+
+    data = pd.DataFrame({
+        'B2': np.random.uniform(100, 2000, n_samples),
+        'B3': np.random.uniform(100, 2000, n_samples),
+        'B4': np.random.uniform(100, 2000, n_samples),
+        'B8': np.random.uniform(100, 3000, n_samples),
+        'B11': np.random.uniform(100, 3000, n_samples),
+        'B12': np.random.uniform(100, 3000, n_samples),
+        'NDVI': np.random.uniform(0, 1, n_samples),
+        'NDMI': np.random.uniform(-1, 1, n_samples),
+        'SAVI': np.random.uniform(0, 1, n_samples),
+        'BSI': np.random.uniform(-1, 1, n_samples),
+    })
+
+    # 🌱 Generate dummy nutrient levels
+    data['N'] = 50 + 10 * data['NDVI'] + np.random.normal(0, 2, n_samples)
+    data['P'] = 30 + 5 * data['SAVI'] + np.random.normal(0, 1, n_samples)
+    data['K'] = 100 + 8 * data['BSI'] + np.random.normal(0, 3, n_samples)
+
+    return data[BANDS].to_numpy(np.float32), data[TARGETS].to_numpy(np.float64)
+
+
+def iter_chunks(path, chunk_rows):
+    """Yield DataFrame chunks of a CSV or Parquet file"""
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Reading Parquet needs pyarrow: pip install pyarrow")
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def read_samples(paths, chunk_rows, sample_frac, seed):
+    """Stream labelled samples into compact float32 feature / float64 target arrays"""
+    rng = np.random.default_rng(seed)
+    features, targets = [], []
+
+    for path in paths:
+        for chunk in iter_chunks(path, chunk_rows):
+            chunk = chunk.rename(columns=LEGACY_NAMES)
+            missing = [c for c in BANDS + TARGETS if c not in chunk.columns]
+            if missing:
+                raise SystemExit(f"❌ {path} is missing columns {missing}")
+
+            y = chunk[TARGETS].to_numpy(np.float64)
+            keep = np.isfinite(y).all(axis=1)
+            if sample_frac < 1:
+                keep &= rng.random(len(chunk)) < sample_frac
+
+            # Same cleaning the API applies to live band values
+            X = chunk[BANDS].to_numpy(np.float32)[keep]
+            X[~np.isfinite(X)] = 0
+
+            features.append(X)
+            targets.append(y[keep])
+
+        print(f"📥 {path}: {sum(len(x) for x in features)} samples so far")
+
+    return np.concatenate(features), np.concatenate(targets)
+
+
+# -------------------------------
+# 🎯 Training
+# -------------------------------
+
+def fit_one(X, y, params, n_jobs):
+    model = RandomForestRegressor(n_jobs=n_jobs, **params)
+    model.fit(pd.DataFrame(X, columns=BANDS), y)
+    # Predict single-threaded so results do not depend on thread scheduling
+    model.n_jobs = None
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the soil N/P/K models")
+    parser.add_argument("--data", nargs="*", default=[], help="CSV / Parquet files (default: synthetic)")
+    parser.add_argument("--chunk-rows", type=int, default=100_000)
+    parser.add_argument("--sample-frac", type=float, default=1.0, help="keep this fraction of rows")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--min-samples-leaf", type=int, default=1)
+    parser.add_argument("--max-leaf-nodes", type=int, default=None)
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="CPU cores to use")
+    parser.add_argument("--compress", type=int, default=0, help="joblib compression level")
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "models"))
+    args = parser.parse_args()
+
+    if args.data:
+        X, Y = read_samples(args.data, args.chunk_rows, args.sample_frac, seed=42)
+    else:
+        print("🌾 No --data given, using synthetic samples")
+        X, Y = synthetic_samples()
+
+    X_train, X_test, Y_train, Y_test = train_test_split(
+        X, Y, test_size=args.test_size, random_state=42
+    )
+    print(f"📊 {len(X_train)} training / {len(X_test)} test samples")
+
+    params = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+        "max_leaf_nodes": args.max_leaf_nodes,
+        "random_state": 42,
+    }
+
+    # The three targets train side by side, each on its share of the cores
+    t0 = time.time()
+    models = Parallel(n_jobs=len(TARGETS), prefer="threads")(
+        delayed(fit_one)(X_train, Y_train[:, j], params, max(1, args.jobs // len(TARGETS)))
+        for j in range(len(TARGETS))
+    )
+    print(f"🎯 Trained {len(models)} models in {time.time() - t0:.1f}s")
+
+    # 💾 Save joblib models, then the compiled engine built from them
+    os.makedirs(args.out, exist_ok=True)
+    for name, model in zip(MODEL_FILES, models):
+        joblib.dump(model, os.path.join(args.out, name), compress=args.compress)
+        print(f"✅ Saved {name}")
+
+    engine = FusedForest.from_models(models)
+
+    scores = {}
+    if len(X_test):
+        preds = engine.predict(X_test)
+        for j, target in enumerate(TARGETS):
+            ss_res = ((Y_test[:, j] - preds[:, j]) ** 2).sum()
+            ss_tot = ((Y_test[:, j] - Y_test[:, j].mean()) ** 2).sum()
+            scores[target] = round(float(1 - ss_res / ss_tot), 4) if ss_tot else None
+        print(f"📈 Test R²: {scores}")
+
+    t0 = time.perf_counter()
+    engine.predict(X_train[:1])
+    row_us = (time.perf_counter() - t0) * 1e6
+
+    # Written beside the live engine and renamed into place: running workers
+    # have models/fused/*.npy memory-mapped, so those files must never be
+    # truncated or mixed with a newer manifest.
+    engine_dir = os.path.join(args.out, "fused")
+    tmp_dir = f"{engine_dir}.tmp-{os.getpid()}"
+    engine.save(
+        tmp_dir,
+        model_version=model_version(args.out),
+        targets=TARGETS,
+        params=params,
+        n_samples=len(X),
+        test_r2=scores,
+        created=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    )
+    replace_dir(tmp_dir, engine_dir)
+
+    size_mb = sum(
+        os.path.getsize(os.path.join(engine_dir, f))
+        for f in os.listdir(engine_dir)
+    ) / 1e6
+    print(f"⚡ Compiled engine: {len(engine.value)} nodes, depth {engine.depth}, "
+          f"{size_mb:.1f} MB, ~{row_us:.0f} µs per single-row prediction")
+
+    print("\n🎉 All models trained and saved successfully!")
 
-for name, model in models.items():
-    joblib.dump(model, f"models/{name}")
-    print(f"✅ Saved {name}")
 
-print("\n🎉 All models trained and saved successfully!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import json
+import os
+
+import numpy as np
+
+from inference import replace_dir
+
+# -------------------------------
+# 🗺 Precomputed Nutrient Grid
+# -------------------------------
+#
+# build_grid.py writes one directory per grid:
+#   coords.npy       (n, 2) float64   lat, lon of each cell
+#   features.npy     (n, 10) float32  band means, in manifest["bands"] order
+#   predictions.npy  (n, 3) float64   N, P, K
+#   manifest.json    names, band list, composite settings, model_version
+#
+# Arrays are opened memory-mapped, so every worker shares the same pages.
+# Lookups go through a KD-tree over unit-sphere vectors: chord distance is
+# monotonic in great-circle distance, so a radius in km maps to an exact
+# chord bound.
+
+EARTH_RADIUS_KM = 6371.0088
+GRID_FORMAT = 1
+
+
+def unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat)
+    ])
+
+
+def km_to_chord(km):
+    # Past half the circumference the chord shrinks again; no two points
+    # on the sphere are further apart than that anyway.
+    km = np.clip(km, 0, np.pi * EARTH_RADIUS_KM)
+    return 2 * np.sin(km / (2 * EARTH_RADIUS_KM))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1.0))
+
+
+def save_grid(out_dir, names, coords, features, predictions, manifest):
+    """Write grid arrays + manifest to a temp directory, then rename it into place.
+
+    Running workers keep the old arrays memory-mapped, so they are never
+    overwritten in place, and the manifest always matches its arrays.
+    """
+    out_dir = os.path.normpath(out_dir)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    np.save(os.path.join(tmp_dir, "coords.npy"), np.asarray(coords, dtype=np.float64))
+    np.save(os.path.join(tmp_dir, "features.npy"), np.asarray(features, dtype=np.float32))
+    np.save(os.path.join(tmp_dir, "predictions.npy"), np.asarray(predictions, dtype=np.float64))
+
+    manifest = dict(manifest, format=GRID_FORMAT, count=len(names), names=list(names))
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    replace_dir(tmp_dir, out_dir)
+
+
+class VillageGrid:
+    def __init__(self, grid_dir):
+        with open(os.path.join(grid_dir, "manifest.json")) as f:
+            self.manifest = json.load(f)
+
+        if self.manifest.get("format") != GRID_FORMAT:
+            raise ValueError(f"Unsupported grid format {self.manifest.get('format')}")
+
+        self.names = self.manifest["names"]
+        self.coords = np.load(os.path.join(grid_dir, "coords.npy"), mmap_mode="r")
+        self.features = np.load(os.path.join(grid_dir, "features.npy"), mmap_mode="r")
+        self.predictions = np.load(os.path.join(grid_dir, "predictions.npy"), mmap_mode="r")
+
+        from scipy.spatial import cKDTree
+
+        self.tree = cKDTree(unit_vectors(self.coords[:, 0], self.coords[:, 1]))
+
+    @property
+    def model_version(self):
+        return self.manifest.get("model_version")
+
+    def nearest(self, lat, lon, max_km):
+        """Index and distance (km) of the closest cell within max_km, or None"""
+        chord, i = self.tree.query(
+            unit_vectors([lat], [lon])[0],
+            distance_upper_bound=km_to_chord(max_km)
+        )
+        if not np.isfinite(chord):
+            return None
+        return int(i), float(chord_to_km(chord))
+
+
+def load_grid(grid_dir, model_version):
+    """Load the grid, or return None if it is missing or built for other models"""
+    if not os.path.exists(os.path.join(grid_dir, "manifest.json")):
+        return None
+
+    try:
+        grid = VillageGrid(grid_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print("⚠️ Village grid could not be loaded:", e)
+        return None
+
+    if grid.model_version != model_version:
+        print(f"⚠️ Village grid is stale (built for models {grid.model_version}, "
+              f"serving {model_version}); rebuild with build_grid.py")
+        return None
+
+    print(f"✅ Village grid loaded: {len(grid.names)} cells")
+    return grid